@@ -1,7 +1,37 @@
 # blog/admin.py
 from django.contrib import admin
+from django.db.models import F
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Category, Tag, Post, Comment, Newsletter
+
+from core.pagecache import purge
+from core.paginator import EstimatedCountPaginator
+from core.snapshot import invalidate_home_snapshot
+
+from .models import Category, Tag, Post, Comment, Newsletter, NewsletterIssue
+from . import counters, related
+from .generation import bump_generation
+from .search import get_search_backend
+
+
+def posts_changed_in_bulk(post_ids, category_ids, author_ids, tag_ids, related_changed=True):
+    """
+    Once per set-based UPDATE of posts, what the post_save handlers would
+    have done per row: recount, invalidate listings and cached pages, and
+    refresh related-posts lists and the search index. Pages are purged through their category,
+    author and tag generations, which every affected post page depends on,
+    so the cost follows the number of distinct taxonomies, not of posts.
+    """
+    counters.refresh_category_counts(category_ids)
+    counters.refresh_tag_counts(tag_ids)
+    counters.refresh_author_counts(author_ids)
+    bump_generation()
+    invalidate_home_snapshot()
+    purge(category=category_ids, author=author_ids, tag=tag_ids)
+    if related_changed:
+        related.schedule_updates(post_ids)
+        get_search_backend().index_posts(post_ids)
 
 
 @admin.register(Category)
@@ -13,8 +43,9 @@ class CategoryAdmin(admin.ModelAdmin):
     list_per_page = 20
 
     def post_count(self, obj):
-        return obj.post_count()  # Uses your model's method
+        return obj.published_post_count
     post_count.short_description = 'Posts'
+    post_count.admin_order_field = 'published_post_count'
 
 
 @admin.register(Tag)
@@ -25,15 +56,16 @@ class TagAdmin(admin.ModelAdmin):
     list_per_page = 30
 
     def post_count(self, obj):
-        return obj.posts.filter(status='published').count()
+        return obj.published_post_count
     post_count.short_description = 'Posts'
+    post_count.admin_order_field = 'published_post_count'
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = [
         'title', 'author', 'category', 'status', 'is_featured',
-        'views', 'like_count', 'reading_time', 'published_at', 'created_at'
+        'views', 'like_count', 'score', 'reading_time', 'published_at', 'created_at'
     ]
     list_filter = [
         'status', 'is_featured', 'category', 'tags', 'created_at', 'published_at'
@@ -44,10 +76,13 @@ class PostAdmin(admin.ModelAdmin):
     ]
     prepopulated_fields = {'slug': ('title',)}
     filter_horizontal = ['tags', 'likes']
-    readonly_fields = ['views', 'created_at', 'updated_at', 'published_at_preview']
+    readonly_fields = ['views', 'word_count', 'reading_time', 'created_at', 'updated_at', 'published_at_preview']
     date_hierarchy = 'published_at'
     list_editable = ['is_featured', 'status']
     list_per_page = 20
+    list_select_related = ['author', 'category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ['make_published', 'make_draft', 'mark_as_featured']
 
     fieldsets = (
@@ -62,11 +97,19 @@ class PostAdmin(admin.ModelAdmin):
             'description': 'Set published_at automatically when status → Published'
         }),
         ('Stats (Read-only)', {
-            'fields': ('views', 'likes', 'created_at', 'updated_at', 'published_at_preview'),
+            'fields': ('views', 'likes', 'word_count', 'reading_time', 'created_at', 'updated_at', 'published_at_preview'),
             'classes': ('collapse',)
         }),
     )
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        url_name = getattr(request.resolver_match, 'url_name', None) or ''
+        if url_name.endswith('_changelist'):
+            # The list never shows the bodies
+            queryset = queryset.without_content()
+        return queryset
+
     def published_at_preview(self, obj):
         if obj.published_at:
             return obj.published_at.strftime('%b %d, %Y at %I:%M %p')
@@ -79,24 +122,36 @@ class PostAdmin(admin.ModelAdmin):
             obj.published_at = timezone.now()
         super().save_model(request, obj, form, change)
 
-    # Custom actions
+    # Custom actions: one UPDATE each, whatever the selection size
+    def _update_posts(self, posts, related_changed=True, **values):
+        posts = posts.order_by()
+        post_ids = list(posts.values_list('pk', flat=True))
+        category_ids = list(posts.exclude(category=None).values_list('category_id', flat=True).distinct())
+        author_ids = list(posts.values_list('author_id', flat=True).distinct())
+        tag_ids = list(
+            Post.tags.through.objects.filter(post__in=posts).order_by()
+            .values_list('tag_id', flat=True).distinct()
+        )
+        updated = posts.update(**values)
+        if updated:
+            posts_changed_in_bulk(post_ids, category_ids, author_ids, tag_ids, related_changed=related_changed)
+        return updated
+
     def make_published(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(status='published')
-        for post in queryset:
-            if not post.published_at:
-                post.published_at = timezone.now()
-                post.save()
+        updated = self._update_posts(
+            queryset.exclude(status='published'),
+            status='published', published_at=Coalesce(F('published_at'), Now()),
+        )
         self.message_user(request, f'{updated} post(s) published.')
     make_published.short_description = "Publish selected posts"
 
     def make_draft(self, request, queryset):
-        updated = queryset.update(status='draft', published_at=None)
+        updated = self._update_posts(queryset.exclude(status='draft'), status='draft', published_at=None)
         self.message_user(request, f'{updated} post(s) set to draft.')
     make_draft.short_description = "Set selected posts to draft"
 
     def mark_as_featured(self, request, queryset):
-        updated = queryset.update(is_featured=True)
+        updated = self._update_posts(queryset.filter(is_featured=False), related_changed=False, is_featured=True)
         self.message_user(request, f'{updated} post(s) marked as featured.')
     mark_as_featured.short_description = "Mark as featured"
 
@@ -107,19 +162,31 @@ class CommentAdmin(admin.ModelAdmin):
     list_filter = ['is_approved', 'created_at', 'post__category']
     search_fields = ['content', 'author__username', 'author__email', 'post__title']
     readonly_fields = ['created_at', 'updated_at']
+    list_select_related = ['post', 'author']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ['approve_comments', 'unapprove_comments']
 
     def short_content(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     short_content.short_description = 'Comment'
 
+    def _set_approved(self, queryset, approved):
+        comments = queryset.exclude(is_approved=approved).order_by()
+        post_ids = list(comments.values_list('post_id', flat=True).distinct())
+        updated = comments.update(is_approved=approved)
+        if updated:
+            counters.refresh_comment_counts(post_ids)
+            purge(post=post_ids)
+        return updated
+
     def approve_comments(self, request, queryset):
-        updated = queryset.update(is_approved=True)
+        updated = self._set_approved(queryset, True)
         self.message_user(request, f'{updated} comment(s) approved.')
     approve_comments.short_description = "Approve selected comments"
 
     def unapprove_comments(self, request, queryset):
-        updated = queryset.update(is_approved=False)
+        updated = self._set_approved(queryset, False)
         self.message_user(request, f'{updated} comment(s) unapproved.')
     unapprove_comments.short_description = "Unapprove selected comments"
 
@@ -140,4 +207,22 @@ class NewsletterAdmin(admin.ModelAdmin):
     def mark_inactive(self, request, queryset):
         updated = queryset.update(is_active=False)
         self.message_user(request, f'{updated} subscriber(s) deactivated.')
-    mark_inactive.short_description = "Mark as inactive"
\ No newline at end of file
+    mark_inactive.short_description = "Mark as inactive"
+
+
+@admin.register(NewsletterIssue)
+class NewsletterIssueAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'sent_count', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['subject']
+    filter_horizontal = ['posts']
+    readonly_fields = ['status', 'last_subscriber_id', 'sent_count', 'created_at', 'started_at', 'finished_at']
+    actions = ['send_issue']
+
+    def send_issue(self, request, queryset):
+        from core import jobs
+        issues = queryset.exclude(status='sent')
+        for issue in issues:
+            jobs.enqueue('blog.send_newsletter_issue', {'issue_id': issue.pk})
+        self.message_user(request, f'{len(issues)} issue(s) queued for sending.')
+    send_issue.short_description = "Send selected issues"
@@ -0,0 +1,352 @@
+# blog/api.py
+"""
+Read-only JSON API for posts, categories, tags, authors and comments.
+
+Rows are read with ``values()`` and serialised straight from the dicts,
+so no model instances are built. ``?fields=title,slug`` limits both the
+columns selected and the keys returned. Listings use cursor pagination
+(``blog.pagination``): ``?cursor=`` comes from the ``next``/``previous``
+links of the previous response, and ``?limit=`` takes at most
+``MAX_LIMIT``.
+
+Every response carries a strong ``ETag`` and honours ``If-None-Match``.
+For posts and comments the tag is derived from ``updated_at`` (plus the
+counters and the content generation, which change without touching it).
+The page is first read with just those narrow columns, so a polling
+client whose copy is current gets its ``304`` after one index-friendly
+query, and the wide columns are only fetched when something changed.
+Categories, tags and authors are small rows without ``updated_at``; their
+tag is a digest of the rows themselves.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+
+from core.instrumentation import query_budget
+
+from .generation import get_generation
+from .models import Category, Comment, Post, Tag
+from .pagination import CursorPaginator
+from .rendering import content_hash, render_markdown
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Field:
+    """An API field: the columns it needs and how to read it from a row."""
+
+    def __init__(self, *columns, get=None):
+        self.columns = columns
+        self.get = get or (lambda row: row[columns[0]])
+
+
+def _file_url(model, field_name):
+    storage = model._meta.get_field(field_name).storage
+    return lambda row: storage.url(row[field_name]) if row[field_name] else None
+
+
+def _post_content(row):
+    if row['content_type'] != 'markdown':
+        return row['content_html']
+    # Rendered and stored on a miss, as Post.rendered_content does
+    source_hash = content_hash(row['content_markdown'])
+    if source_hash != row['content_rendered_hash']:
+        row['content_rendered'] = render_markdown(row['content_markdown'])
+        row['content_rendered_hash'] = source_hash
+        Post.objects.filter(pk=row['id']).update(
+            content_rendered=row['content_rendered'],
+            content_rendered_hash=source_hash,
+        )
+    return row['content_rendered']
+
+
+POST_FIELDS = {
+    'id': Field('id'),
+    'title': Field('title'),
+    'slug': Field('slug'),
+    'url': Field('slug', get=lambda row: reverse('blog:post_detail', kwargs={'slug': row['slug']})),
+    'excerpt': Field('excerpt'),
+    'content': Field(
+        'id', 'content_type', 'content_html', 'content_markdown', 'content_rendered', 'content_rendered_hash',
+        get=_post_content,
+    ),
+    'image': Field('featured_image', get=_file_url(Post, 'featured_image')),
+    'category': Field('category__slug'),
+    'category_name': Field('category__name'),
+    'author': Field('author__username'),
+    # Filled in from one extra query, see _attach_tags
+    'tags': Field(get=lambda row: row['tags']),
+    'is_featured': Field('is_featured'),
+    'views': Field('views'),
+    'like_count': Field('like_count'),
+    'comment_count': Field('comment_count'),
+    'word_count': Field('word_count'),
+    'reading_time': Field('reading_time'),
+    'published_at': Field('published_at'),
+    'updated_at': Field('updated_at'),
+}
+POST_LIST_FIELDS = (
+    'id', 'title', 'slug', 'url', 'excerpt', 'image', 'category', 'author', 'tags',
+    'like_count', 'comment_count', 'published_at',
+)
+POST_DETAIL_FIELDS = (*POST_LIST_FIELDS, 'content', 'category_name', 'views', 'updated_at')
+# Columns that move without updated_at changing; part of the version when requested
+POST_COUNTERS = ('views', 'like_count', 'comment_count')
+
+COMMENT_FIELDS = {
+    'id': Field('id'),
+    'author': Field('author__username'),
+    'content': Field('content'),
+    'parent': Field('parent_id'),
+    'created_at': Field('created_at'),
+    'updated_at': Field('updated_at'),
+}
+
+CATEGORY_FIELDS = {
+    'id': Field('id'),
+    'name': Field('name'),
+    'slug': Field('slug'),
+    'url': Field('slug', get=lambda row: reverse('blog:category_posts', kwargs={'slug': row['slug']})),
+    'description': Field('description'),
+    'icon': Field('icon'),
+    'color': Field('color'),
+    'post_count': Field('published_post_count'),
+}
+
+TAG_FIELDS = {
+    'id': Field('id'),
+    'name': Field('name'),
+    'slug': Field('slug'),
+    'url': Field('slug', get=lambda row: reverse('blog:tag_posts', kwargs={'slug': row['slug']})),
+    'post_count': Field('published_post_count'),
+}
+
+
+def _author_fields():
+    from users.models import CustomUser
+
+    return {
+        'id': Field('id'),
+        'username': Field('username'),
+        'name': Field('first_name', 'last_name', 'username', get=lambda row: (
+            f"{row['first_name']} {row['last_name']}" if row['first_name'] and row['last_name'] else row['username']
+        )),
+        'url': Field('username', get=lambda row: reverse('blog:author_posts', kwargs={'username': row['username']})),
+        'bio': Field('bio'),
+        'avatar': Field('avatar', get=_file_url(CustomUser, 'avatar')),
+        'website': Field('website'),
+        'twitter': Field('twitter'),
+        'github': Field('github'),
+        'linkedin': Field('linkedin'),
+        'location': Field('location'),
+    }
+
+
+# Helpers --------------------------------------------------------------------
+
+def _selected(request, fields, default):
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(default)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(fields)}")
+    return names
+
+
+def _limit(request):
+    try:
+        return max(1, min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        raise BadRequest('limit must be an integer')
+
+
+def _columns(fields, names, *extra):
+    columns = dict.fromkeys(extra)
+    for name in names:
+        columns.update(dict.fromkeys(fields[name].columns))
+    return list(columns)
+
+
+def _serialize(fields, names, row):
+    return {name: fields[name].get(row) for name in names}
+
+
+def _link(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def _etag(*parts):
+    payload = json.dumps(parts, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _respond(request, etag, build):
+    """304 if the client's copy matches ``etag``, else the JSON from ``build()``."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build(), json_dumps_params={'separators': (',', ':')})
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _attach_tags(rows):
+    tags = {}
+    pairs = Post.tags.through.objects.filter(post_id__in=[row['id'] for row in rows]).values_list('post_id', 'tag__slug')
+    for post_id, slug in pairs.order_by('tag__name'):
+        tags.setdefault(post_id, []).append(slug)
+    for row in rows:
+        row['tags'] = tags.get(row['id'], [])
+
+
+def _page_response(request, queryset, fields, names, ordering, version, extra_version=()):
+    """
+    Cursor-paginate ``queryset``. The page is read with the ``version``
+    columns only; the rest of the requested columns are fetched by primary
+    key after the ETag check failed.
+    """
+    limit = _limit(request)
+    paginator = CursorPaginator(
+        queryset.values(*dict.fromkeys([*version, *(name.lstrip('-') for name in ordering)])),
+        limit, ordering=ordering,
+    )
+    page = paginator.page(request.GET.get('cursor'))
+    ids = [row['id'] for row in page]
+    etag = _etag(names, limit, [list(row.values()) for row in page], page.next_cursor, page.previous_cursor, *extra_version)
+
+    def build():
+        rows = list(queryset.filter(pk__in=ids).values(*_columns(fields, names, 'id')))
+        if 'tags' in names:
+            _attach_tags(rows)
+        by_id = {row['id']: row for row in rows}
+        return {
+            'results': [_serialize(fields, names, by_id[pk]) for pk in ids if pk in by_id],
+            'next': _link(request, page.next_cursor),
+            'previous': _link(request, page.previous_cursor),
+        }
+
+    return _respond(request, etag, build)
+
+
+def _table_response(request, queryset, fields, names, ordering):
+    """Cursor-paginate a table of small rows; the ETag digests the page itself."""
+    limit = _limit(request)
+    paginator = CursorPaginator(queryset.values(*_columns(fields, names, *ordering)), limit, ordering=ordering)
+    page = paginator.page(request.GET.get('cursor'))
+    body = {
+        'results': [_serialize(fields, names, row) for row in page],
+        'next': _link(request, page.next_cursor),
+        'previous': _link(request, page.previous_cursor),
+    }
+    return _respond(request, _etag(body), lambda: body)
+
+
+def api_view(budget):
+    """GET-only JSON view with a query budget; ``BadRequest`` becomes a 400."""
+    def decorator(view):
+        @query_budget(budget)
+        @require_GET
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except BadRequest as error:
+                return JsonResponse({'error': str(error)}, status=400)
+            except Http404:
+                return JsonResponse({'error': 'Not found'}, status=404)
+        return wrapper
+    return decorator
+
+
+# Views ----------------------------------------------------------------------
+
+@api_view(4)
+def post_list(request):
+    """Published posts, newest first; filter with ?category=, ?tag= or ?author=."""
+    names = _selected(request, POST_FIELDS, POST_LIST_FIELDS)
+    posts = Post.objects.filter(status='published')
+    if request.GET.get('category'):
+        posts = posts.filter(category__slug=request.GET['category'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    if request.GET.get('tag'):
+        posts = posts.filter(tags__slug=request.GET['tag'])
+    version = ['id', 'published_at', 'updated_at', *(name for name in POST_COUNTERS if name in names)]
+    return _page_response(
+        request, posts, POST_FIELDS, names,
+        ordering=('-published_at', '-id'), version=version, extra_version=[get_generation()],
+    )
+
+
+@api_view(3)
+def post_detail(request, slug):
+    names = _selected(request, POST_FIELDS, POST_DETAIL_FIELDS)
+    columns = _columns(POST_FIELDS, names, 'id', 'updated_at', *POST_COUNTERS)
+    row = Post.objects.filter(status='published', slug=slug).values(*columns).first()
+    if row is None:
+        raise Http404
+    etag = _etag(names, row['id'], row['updated_at'], [row[name] for name in POST_COUNTERS], get_generation())
+
+    def build():
+        if 'tags' in names:
+            _attach_tags([row])
+        return _serialize(POST_FIELDS, names, row)
+
+    return _respond(request, etag, build)
+
+
+@api_view(4)
+def comment_list(request, slug):
+    """Approved comments of a post, oldest first; ``parent`` links replies."""
+    names = _selected(request, COMMENT_FIELDS, COMMENT_FIELDS)
+    post_id = Post.objects.filter(status='published', slug=slug).values_list('id', flat=True).first()
+    if post_id is None:
+        raise Http404
+    comments = Comment.objects.filter(post_id=post_id, is_approved=True)
+    return _page_response(
+        request, comments, COMMENT_FIELDS, names,
+        ordering=('created_at', 'id'), version=['id', 'created_at', 'updated_at'],
+    )
+
+
+@api_view(2)
+def category_list(request):
+    names = _selected(request, CATEGORY_FIELDS, CATEGORY_FIELDS)
+    return _table_response(request, Category.objects.all(), CATEGORY_FIELDS, names, ordering=('name', 'id'))
+
+
+@api_view(2)
+def tag_list(request):
+    names = _selected(request, TAG_FIELDS, TAG_FIELDS)
+    return _table_response(request, Tag.objects.all(), TAG_FIELDS, names, ordering=('name', 'id'))
+
+
+@api_view(2)
+def author_list(request):
+    """Users with at least one published post."""
+    from users.models import CustomUser
+
+    fields = _author_fields()
+    names = _selected(request, fields, fields)
+    authors = CustomUser.objects.filter(
+        Exists(Post.objects.filter(author=OuterRef('pk'), status='published'))
+    )
+    return _table_response(request, authors, fields, names, ordering=('id',))
@@ -0,0 +1,15 @@
+# blog/api_urls.py
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.post_list, name='post_list'),
+    path('posts/<slug:slug>/', api.post_detail, name='post_detail'),
+    path('posts/<slug:slug>/comments/', api.comment_list, name='comment_list'),
+    path('categories/', api.category_list, name='category_list'),
+    path('tags/', api.tag_list, name='tag_list'),
+    path('authors/', api.author_list, name='author_list'),
+]
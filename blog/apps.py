@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from .signals import (
+            connect_activity_signals, connect_counter_signals, connect_generation_signals, connect_related_signals,
+            connect_search_signals,
+        )
+        connect_counter_signals()
+        connect_activity_signals()
+        connect_related_signals()
+        connect_search_signals()
+        connect_generation_signals()
@@ -0,0 +1,139 @@
+# blog/async_views.py
+"""
+Async versions of the hottest blog views and the like endpoints.
+
+``blog.urls`` routes to these instead of ``blog.views`` when
+``ASYNC_VIEWS`` is on, which only makes sense under ASGI (see
+``Procfile.asgi``). Lookups use the async ORM. Queries that don't depend
+on each other (a listing page and its featured posts, a post's comment
+thread, related posts and like state) run concurrently through
+``core.asyncdb.gather_queries``. Templates are rendered with
+``sync_to_async``: context processors and template tags may still touch
+the session or the cache synchronously.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET, require_POST
+
+from core.asyncdb import gather_queries
+from core.conditional import conditional_page
+from core.instrumentation import query_budget
+from core.ratelimit import ratelimit
+from core.pagecache import anonymous_page_cache, depends_on
+
+from . import likes, related, view_counter
+from .comments import load_comment_tree
+from .models import Post
+from .pagination import paginate_posts
+from .search import search_posts
+from .views import count_cached_view, count_not_modified_view, listing_validators, post_validators
+
+arender = sync_to_async(render)
+
+
+@query_budget(10)
+@conditional_page(listing_validators)
+async def post_list(request):
+    posts = Post.objects.filter(status='published').cards()
+
+    query = request.GET.get('q')
+    if query:
+        posts = await sync_to_async(search_posts)(posts, query)
+
+    def page():
+        if query:
+            page_obj = Paginator(posts, 9).get_page(request.GET.get('page'))
+        else:
+            page_obj = paginate_posts(request, posts)
+        page_obj.object_list = list(page_obj.object_list)
+        return page_obj
+
+    results = await gather_queries(
+        posts=page,
+        featured_posts=lambda: list(posts.filter(is_featured=True)[:3]),
+    )
+    context = {
+        'posts': results['posts'],
+        'featured_posts': results['featured_posts'],
+        'query': query,
+    }
+    return await arender(request, 'blog/post_list.html', context)
+
+
+@query_budget(10)
+@conditional_page(post_validators, on_not_modified=count_not_modified_view)
+@anonymous_page_cache(on_hit=count_cached_view)
+async def post_detail(request, slug):
+    try:
+        post = await (
+            Post.objects.select_related('author', 'category').prefetch_related('tags')
+            .aget(slug=slug, status='published')
+        )
+    except Post.DoesNotExist:
+        raise Http404('No Post matches the given query.')
+    await sync_to_async(depends_on)(request, post=post.pk, category=post.category_id, author=post.author_id)
+
+    await sync_to_async(view_counter.record)(post.pk)
+    post.views += 1
+
+    # The template reads request.user; share the user auser() loaded
+    user = request.user = await request.auser()
+    results = await gather_queries(
+        comment_tree=lambda: load_comment_tree(post),
+        related_posts=lambda: related.related_posts(post),
+        liked=lambda: likes.liked_post_ids(user, [post.pk]),
+    )
+    comment_tree = results['comment_tree']
+
+    context = {
+        'post': post,
+        'comments': comment_tree.page(request.GET.get('comments')),
+        'comment_count': comment_tree.count,
+        'related_posts': results['related_posts'],
+        'user_liked': post.pk in results['liked'],
+    }
+    return await arender(request, 'blog/post_detail.html', context)
+
+
+# A toggle that finds nothing to delete inserts, one more statement
+@query_budget(9)
+@login_required
+@require_POST
+@ratelimit('like', user='60/m', ip='120/m', endpoint='3000/m')
+async def post_like(request, slug):
+    try:
+        post_id = await Post.objects.values_list('pk', flat=True).aget(slug=slug)
+    except Post.DoesNotExist:
+        raise Http404('No Post matches the given query.')
+
+    action = request.POST.get('action')
+    if action not in likes.ACTIONS:
+        action = None
+    user = await request.auser()
+    liked, like_count = await sync_to_async(likes.set_like)(post_id, user.pk, action)
+
+    return JsonResponse({
+        'liked': liked,
+        'like_count': like_count
+    })
+
+
+@query_budget(3)
+@require_GET
+async def liked_posts(request):
+    try:
+        post_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk][:100]
+    except ValueError:
+        return JsonResponse({'liked': []}, status=400)
+    user = await request.auser()
+    if not user.is_authenticated or not post_ids:
+        return JsonResponse({'liked': []})
+    liked = [
+        pk async for pk in likes.Through.objects
+        .filter(customuser_id=user.pk, post_id__in=post_ids)
+        .values_list('post_id', flat=True)
+    ]
+    return JsonResponse({'liked': sorted(liked)})
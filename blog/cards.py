@@ -0,0 +1,146 @@
+# blog/cards.py
+"""
+Lightweight post cards for listings, see ``PostQuerySet.cards()``.
+
+A listing only shows a card per post: title, excerpt, image, author,
+category and a few counters. Loading ``Post`` instances for that also
+loads the body columns and builds a model instance (plus one per author,
+category and tag) for every row. ``cards()`` instead selects the card
+columns with ``values()``, author and category joined in the same query,
+and turns each row into a slotted ``PostCard``. Tags come from one query
+on the through table.
+
+Cards quack like posts where the templates look: ``post.author.
+get_full_name``, ``post.category.name``, ``post.get_absolute_url``, and
+``featured_image``/``avatar`` are real ``FieldFile`` objects with their
+``*_variants`` manifests, so ``{% picture %}`` works unchanged. Cards are
+picklable and go into the homepage snapshot as they are.
+"""
+from django.db.models.fields.files import FieldFile
+from django.db.models.query import BaseIterable, ValuesIterable
+from django.urls import reverse
+
+from .models import Post
+
+POST_COLUMNS = (
+    'id', 'title', 'slug', 'excerpt', 'featured_image', 'featured_image_variants',
+    'views', 'like_count', 'comment_count', 'reading_time', 'published_at', 'is_featured',
+)
+AUTHOR_COLUMNS = ('id', 'username', 'first_name', 'last_name', 'avatar', 'avatar_variants')
+CATEGORY_COLUMNS = ('id', 'name', 'slug', 'color')
+COLUMNS = (
+    *POST_COLUMNS,
+    *(f'author__{name}' for name in AUTHOR_COLUMNS),
+    *(f'category__{name}' for name in CATEGORY_COLUMNS),
+)
+
+
+def _file(model, field_name, name):
+    field = model._meta.get_field(field_name)
+    return FieldFile(None, field, name or None)
+
+
+class AuthorCard:
+    __slots__ = AUTHOR_COLUMNS
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_full_name(self):
+        # Same as CustomUser.get_full_name
+        if self.first_name and self.last_name:
+            return f'{self.first_name} {self.last_name}'
+        return self.username
+
+    def get_absolute_url(self):
+        return reverse('blog:author_posts', kwargs={'username': self.username})
+
+    def __str__(self):
+        return self.username
+
+
+class CategoryCard:
+    __slots__ = CATEGORY_COLUMNS
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_absolute_url(self):
+        return reverse('blog:category_posts', kwargs={'slug': self.slug})
+
+    def __str__(self):
+        return self.name
+
+
+class TagCard:
+    __slots__ = ('name', 'slug')
+
+    def __init__(self, name, slug):
+        self.name = name
+        self.slug = slug
+
+    def get_absolute_url(self):
+        return reverse('blog:tag_posts', kwargs={'slug': self.slug})
+
+    def __str__(self):
+        return self.name
+
+
+class PostCard:
+    __slots__ = (*POST_COLUMNS, 'author', 'category', 'tags')
+
+    @classmethod
+    def from_row(cls, row, tags=()):
+        from users.models import CustomUser
+
+        card = cls()
+        for name in POST_COLUMNS:
+            setattr(card, name, row[name])
+        card.featured_image = _file(Post, 'featured_image', row['featured_image'])
+        author = {name: row[f'author__{name}'] for name in AUTHOR_COLUMNS}
+        author['avatar'] = _file(CustomUser, 'avatar', author['avatar'])
+        card.author = AuthorCard(**author)
+        card.category = (
+            CategoryCard(**{name: row[f'category__{name}'] for name in CATEGORY_COLUMNS})
+            if row['category__id'] is not None else None
+        )
+        card.tags = list(tags)
+        return card
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_absolute_url(self):
+        return reverse('blog:post_detail', kwargs={'slug': self.slug})
+
+    def __str__(self):
+        return self.title
+
+
+class PostCardIterable(BaseIterable):
+    """Yield a ``PostCard`` per row of a ``values(*COLUMNS)`` queryset."""
+
+    def __iter__(self):
+        rows = list(ValuesIterable(self.queryset, self.chunked_fetch, self.chunk_size))
+        tags = {}
+        if rows:
+            pairs = (
+                Post.tags.through.objects.filter(post_id__in=[row['id'] for row in rows])
+                .order_by('tag__name')
+                .values_list('post_id', 'tag__name', 'tag__slug')
+            )
+            for post_id, name, slug in pairs:
+                tags.setdefault(post_id, []).append(TagCard(name, slug))
+        for row in rows:
+            yield PostCard.from_row(row, tags.get(row['id'], ()))
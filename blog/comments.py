@@ -0,0 +1,54 @@
+# blog/comments.py
+"""
+Threaded comment loading for ``post_detail``.
+
+All approved comments of a post are fetched together with their authors in
+a single query and linked into a tree in memory, so rendering a thread of
+any depth costs one query instead of one per comment and reply author.
+"""
+from django.core.paginator import Paginator
+
+from .models import Comment
+
+THREADS_PER_PAGE = 20
+
+
+class CommentTree:
+    def __init__(self, comments):
+        by_id = {}
+        for comment in comments:
+            comment._tree_children = []
+            by_id[comment.pk] = comment
+
+        self.roots = []
+        for comment in comments:
+            if comment.parent_id is None:
+                self.roots.append(comment)
+            elif comment.parent_id in by_id:
+                by_id[comment.parent_id]._tree_children.append(comment)
+            # Replies to unapproved comments are hidden with their parent.
+
+        self.count = self._count(self.roots)
+
+    @staticmethod
+    def _count(nodes):
+        count = 0
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node._tree_children)
+        return count
+
+    def page(self, number, per_page=THREADS_PER_PAGE):
+        """Paginate top-level threads; replies always stay with their thread."""
+        return Paginator(self.roots, per_page).get_page(number)
+
+
+def load_comment_tree(post):
+    comments = list(
+        Comment.objects.filter(post=post, is_approved=True)
+        .select_related('author')
+        .order_by('created_at', 'pk')
+    )
+    return CommentTree(comments)
@@ -0,0 +1,87 @@
+# blog/counters.py
+"""
+Denormalized counters: ``Post.like_count``, ``Post.comment_count`` and
+``published_post_count`` on ``Category``, ``Tag`` and authors.
+
+Signal handlers in ``blog.signals`` keep them current; the ``refresh_*``
+helpers recompute them from scratch with one correlated-subquery UPDATE
+and are what the ``recount`` management command uses to repair drift.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Post, Category, Tag, Comment
+
+
+def _count_subquery(queryset, outer_field):
+    counted = (
+        queryset.filter(**{outer_field: OuterRef('pk')})
+        .order_by()
+        .values(outer_field)
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def _restrict(queryset, ids):
+    if ids is None:
+        return queryset
+    ids = [pk for pk in set(ids) if pk is not None]
+    return queryset.filter(pk__in=ids) if ids else queryset.none()
+
+
+def refresh_like_counts(post_ids=None):
+    likes = Post.likes.through.objects.all()
+    return _restrict(Post.objects.all(), post_ids).update(
+        like_count=_count_subquery(likes, 'post_id')
+    )
+
+
+def refresh_comment_counts(post_ids=None):
+    approved = Comment.objects.filter(is_approved=True)
+    return _restrict(Post.objects.all(), post_ids).update(
+        comment_count=_count_subquery(approved, 'post_id')
+    )
+
+
+def refresh_category_counts(category_ids=None):
+    published = Post.objects.filter(status='published')
+    return _restrict(Category.objects.all(), category_ids).update(
+        published_post_count=_count_subquery(published, 'category_id')
+    )
+
+
+def refresh_tag_counts(tag_ids=None):
+    published = Post.tags.through.objects.filter(post__status='published')
+    return _restrict(Tag.objects.all(), tag_ids).update(
+        published_post_count=_count_subquery(published, 'tag_id')
+    )
+
+
+def refresh_author_counts(author_ids=None):
+    published = Post.objects.filter(status='published')
+    return _restrict(get_user_model().objects.all(), author_ids).update(
+        published_post_count=_count_subquery(published, 'author_id')
+    )
+
+
+def refresh_for_posts(posts):
+    """Recount the categories, tags and authors touched by ``posts`` (a queryset)."""
+    post_ids = list(posts.values_list('pk', flat=True))
+    rows = list(Post.objects.filter(pk__in=post_ids).values_list('category_id', 'author_id'))
+    tag_ids = Post.tags.through.objects.filter(post_id__in=post_ids).values_list('tag_id', flat=True)
+    refresh_category_counts([category_id for category_id, _ in rows])
+    refresh_author_counts([author_id for _, author_id in rows])
+    refresh_tag_counts(list(tag_ids))
+
+
+def recount_all():
+    return {
+        'posts (likes)': refresh_like_counts(),
+        'posts (comments)': refresh_comment_counts(),
+        'categories': refresh_category_counts(),
+        'tags': refresh_tag_counts(),
+        'authors': refresh_author_counts(),
+    }
@@ -0,0 +1,20 @@
+# blog/feed_urls.py
+"""Sitemaps and feeds, mounted at the site root (see blog.sitemaps, blog.feeds)."""
+from django.urls import path
+
+from . import feeds, sitemaps
+
+app_name = 'feeds'
+
+urlpatterns = [
+    path('sitemap.xml', sitemaps.sitemap_index, name='sitemap_index'),
+    path('sitemap-<str:section>-<int:page>.xml', sitemaps.sitemap_section, name='sitemap_section'),
+]
+
+for fmt in feeds.FORMATS:
+    urlpatterns += [
+        path(f'feeds/{fmt}.xml', feeds.feed, {'fmt': fmt}, name=fmt),
+        path(f'feeds/category/<slug:slug>/{fmt}.xml', feeds.feed, {'fmt': fmt, 'kind': 'category'}, name=f'category_{fmt}'),
+        path(f'feeds/tag/<slug:slug>/{fmt}.xml', feeds.feed, {'fmt': fmt, 'kind': 'tag'}, name=f'tag_{fmt}'),
+        path(f'feeds/author/<str:slug>/{fmt}.xml', feeds.feed, {'fmt': fmt, 'kind': 'author'}, name=f'author_{fmt}'),
+    ]
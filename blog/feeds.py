@@ -0,0 +1,208 @@
+# blog/feeds.py
+"""
+Streaming RSS 2.0 and Atom feeds.
+
+The latest ``FEED_ITEMS`` published posts, site-wide or for one category,
+tag or author::
+
+    /feeds/rss.xml                      /feeds/atom.xml
+    /feeds/category/<slug>/rss.xml      /feeds/category/<slug>/atom.xml
+    /feeds/tag/<slug>/rss.xml           ...
+    /feeds/author/<username>/rss.xml    ...
+
+Items are read with ``values_list(...).iterator(chunk_size=...)`` and
+written out as the response streams; no model instances are built.
+Feeds answer conditional GETs (``core.conditional``): the ``ETag`` follows
+the content generation and the feed's category/tag/author generation,
+``Last-Modified`` is the newest item's ``published_at``. The same
+generators back ``manage.py generate_feeds``.
+"""
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import get_tag_uri, rfc2822_date, rfc3339_date
+
+from core.conditional import conditional_page
+
+from .generation import get_generations
+from .models import Category, Post, Tag
+from .sitemaps import absolute
+
+FORMATS = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+}
+CHUNK_SIZE = 100
+ITEM_COLUMNS = (
+    'slug', 'title', 'excerpt', 'published_at', 'updated_at',
+    'author__username', 'author__first_name', 'author__last_name', 'category__name',
+)
+
+
+def feed_items():
+    return getattr(settings, 'FEED_ITEMS', 50)
+
+
+# kind: (lookup field, post filter, display name columns)
+KINDS = {
+    'category': ('slug', 'category', ('name',)),
+    'tag': ('slug', 'tags', ('name',)),
+    'author': ('username', 'author', ('username', 'first_name', 'last_name')),
+}
+
+
+def _model(kind):
+    if kind == 'author':
+        from users.models import CustomUser
+        return CustomUser
+    return {'category': Category, 'tag': Tag}[kind]
+
+
+class Feed:
+    """One feed: its posts, title and links."""
+
+    def __init__(self, fmt, kind=None, pk=None, name=None, key=None):
+        self.fmt = fmt
+        self.kind = kind
+        self.pk = pk
+        self.key = key
+        site = getattr(settings, 'SITE_NAME', 'EchoTales')
+        self.title = f'{site}: {name}' if name else site
+
+    @classmethod
+    def lookup(cls, fmt, kind=None, key=None):
+        """The feed for ``kind``/``key`` (a slug or username), or None if there's no such object."""
+        if kind is None:
+            return cls(fmt)
+        field, _, name_columns = KINDS[kind]
+        row = _model(kind).objects.filter(**{field: key}).values_list('pk', *name_columns).first()
+        if row is None:
+            return None
+        pk, *names = row
+        if kind == 'author':
+            username, first_name, last_name = names
+            name = f'{first_name} {last_name}' if first_name and last_name else username
+        else:
+            name = names[0]
+        return cls(fmt, kind, pk, name, key)
+
+    def posts(self):
+        posts = Post.objects.filter(status='published', published_at__isnull=False)
+        if self.kind is not None:
+            posts = posts.filter(**{KINDS[self.kind][1]: self.pk})
+        return posts.order_by('-published_at', '-id')
+
+    def dependencies(self):
+        return ['content', *([f'{self.kind}:{self.pk}'] if self.kind else [])]
+
+    def page_url(self):
+        if self.kind is None:
+            return reverse('core:home')
+        name = {'category': 'blog:category_posts', 'tag': 'blog:tag_posts', 'author': 'blog:author_posts'}[self.kind]
+        return reverse(name, args=[self.key])
+
+    def url(self):
+        if self.kind is None:
+            return reverse(f'feeds:{self.fmt}')
+        return reverse(f'feeds:{self.kind}_{self.fmt}', args=[self.key])
+
+    def items(self):
+        rows = self.posts().values_list(*ITEM_COLUMNS)[:feed_items()]
+        for slug, title, excerpt, published_at, updated_at, username, first_name, last_name, category in (
+            rows.iterator(chunk_size=CHUNK_SIZE)
+        ):
+            yield {
+                'link': absolute(reverse('blog:post_detail', kwargs={'slug': slug})),
+                'title': title,
+                'description': excerpt,
+                'published_at': published_at,
+                'updated_at': updated_at,
+                'author': f'{first_name} {last_name}' if first_name and last_name else username,
+                'category': category,
+            }
+
+    def generate(self):
+        return (self._rss if self.fmt == 'rss' else self._atom)()
+
+    def _rss(self):
+        yield (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<channel><title>{escape(self.title)}</title><link>{escape(absolute(self.page_url()))}</link>'
+            f'<description>{escape(self.title)}</description><language>{settings.LANGUAGE_CODE}</language>'
+            f'<atom:link href={quoteattr(absolute(self.url()))} rel="self"/>\n'
+        )
+        for item in self.items():
+            category = f'<category>{escape(item["category"])}</category>' if item['category'] else ''
+            yield (
+                f'<item><title>{escape(item["title"])}</title><link>{escape(item["link"])}</link>'
+                f'<description>{escape(item["description"])}</description>'
+                f'<dc:creator>{escape(item["author"])}</dc:creator>{category}'
+                f'<pubDate>{rfc2822_date(item["published_at"])}</pubDate>'
+                f'<guid isPermaLink="true">{escape(item["link"])}</guid></item>\n'
+            )
+        yield '</channel></rss>\n'
+
+    def _atom(self):
+        # The feed's <updated> must come first, but is only known after the
+        # items; the newest published_at is read up front instead.
+        latest = self.posts().values_list('published_at', flat=True).first()
+        yield (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>{escape(self.title)}</title>'
+            f'<link href={quoteattr(absolute(self.page_url()))} rel="alternate"/>'
+            f'<link href={quoteattr(absolute(self.url()))} rel="self"/>'
+            f'<id>{escape(absolute(self.url()))}</id>'
+            + (f'<updated>{rfc3339_date(latest)}</updated>' if latest else '') + '\n'
+        )
+        for item in self.items():
+            category = f'<category term={quoteattr(item["category"])}/>' if item['category'] else ''
+            yield (
+                f'<entry><title>{escape(item["title"])}</title>'
+                f'<link href={quoteattr(item["link"])} rel="alternate"/>'
+                f'<id>{escape(get_tag_uri(item["link"], item["published_at"]))}</id>'
+                f'<published>{rfc3339_date(item["published_at"])}</published>'
+                f'<updated>{rfc3339_date(max(item["published_at"], item["updated_at"]))}</updated>'
+                f'<author><name>{escape(item["author"])}</name></author>{category}'
+                f'<summary>{escape(item["description"])}</summary></entry>\n'
+            )
+        yield '</feed>\n'
+
+
+def documents():
+    """``(url path, content type, chunks)`` for every feed."""
+    for fmt, content_type in FORMATS.items():
+        yield reverse(f'feeds:{fmt}'), content_type, Feed(fmt).generate()
+    for kind, (field, _, _) in KINDS.items():
+        if kind == 'author':
+            keys = _model(kind).objects.filter(posts__status='published').distinct()
+        else:
+            keys = _model(kind).objects.filter(published_post_count__gt=0)
+        for key in keys.order_by('pk').values_list(field, flat=True).iterator(chunk_size=CHUNK_SIZE):
+            for fmt, content_type in FORMATS.items():
+                feed = Feed.lookup(fmt, kind, key)
+                yield feed.url(), content_type, feed.generate()
+
+
+# Views ----------------------------------------------------------------------
+
+def feed_validators(request, fmt, kind=None, slug=None):
+    # Kept for the view, which runs next unless the client's copy is current
+    feed = request._feed = Feed.lookup(fmt, kind, slug)
+    if feed is None:
+        return None
+    return {
+        'etag': sorted(get_generations(feed.dependencies()).items()),
+        'last_modified': feed.posts().values_list('published_at', flat=True).first(),
+    }
+
+
+@conditional_page(feed_validators)
+def feed(request, fmt, kind=None, slug=None):
+    feed = request._feed if hasattr(request, '_feed') else Feed.lookup(fmt, kind, slug)
+    if feed is None:
+        raise Http404('No such feed.')
+    return StreamingHttpResponse(feed.generate(), content_type=FORMATS[fmt])
@@ -0,0 +1,68 @@
+# blog/generation.py
+"""
+Content generation counter.
+
+Integers in the cache that are bumped when content changes. The default
+``content`` generation moves whenever published content changes (see
+``blog.signals.post_content_changed``); narrower ones such as ``post:12``
+or ``category:3`` are bumped by ``core.pagecache.purge``. Cached fragments
+and pages record the generations they were built against, so a bump makes
+exactly those entries miss instead of waiting for a TTL.
+
+If the counter is evicted it restarts from the current time in
+milliseconds rather than from 1, so it never falls back to a generation
+whose entries may still be cached.
+
+Counters only work across processes in a shared cache (Redis, Memcached,
+database). In a per-process ``LocMemCache`` a bump in one worker, the admin
+or ``run_worker`` is invisible to the others; ``is_shared()`` tells, and
+the ``core`` system checks refuse features relying on it.
+"""
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+GENERATION_KEY = 'blog:generation:%s'
+
+
+def _initial():
+    return int(time.time() * 1000)
+
+
+def is_shared(alias='default'):
+    """Whether every process sees the same counters."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def get_generation(name='content'):
+    key = GENERATION_KEY % name
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial(), None)
+        generation = cache.get(key, _initial())
+    return generation
+
+
+def bump_generation(name='content'):
+    key = GENERATION_KEY % name
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Missing key: starting fresh is already a new generation.
+        cache.add(key, _initial(), None)
+        return cache.get(key)
+
+
+def get_generations(names):
+    """``{name: generation}`` for several counters in one cache round trip."""
+    keys = {GENERATION_KEY % name: name for name in names}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        initial = _initial()
+        for key in missing:
+            cache.add(key, initial, None)
+        found.update(cache.get_many(missing))
+    return {name: found.get(key) for key, name in keys.items()}
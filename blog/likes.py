@@ -0,0 +1,94 @@
+# blog/likes.py
+"""
+Like toggling straight against the ``Post.likes`` through table.
+
+``post_like`` used to run ``exists()`` and then ``add()``/``remove()``. Two
+quick clicks could both see "not liked" and race. Here each change is a
+single conditional ``DELETE`` or ``INSERT ... ON CONFLICT DO NOTHING`` on
+the through table. Only a statement that actually changed a row moves
+``Post.like_count``, and it moves by exactly one, in the same
+transaction. The new total comes back from ``UPDATE ... RETURNING``, so
+nothing is recounted. The change is also added to the post's trending
+activity for the current hour (``blog.trending``).
+
+The raw statements don't send ``m2m_changed``, so the counter handlers in
+``blog.signals`` don't count these changes a second time. Both PostgreSQL
+and SQLite (3.35+) support ``ON CONFLICT`` and ``RETURNING``.
+"""
+from django.db import connection, transaction
+
+from .models import Post
+from .trending import record_activity
+
+LIKE = 'like'
+UNLIKE = 'unlike'
+ACTIONS = (LIKE, UNLIKE)
+
+Through = Post.likes.through
+TABLE = Through._meta.db_table
+POST_COLUMN = Through._meta.get_field('post').column
+USER_COLUMN = Through._meta.get_field('customuser').column
+
+
+def _delete(cursor, post_id, user_id):
+    cursor.execute(
+        f'DELETE FROM {TABLE} WHERE {POST_COLUMN} = %s AND {USER_COLUMN} = %s RETURNING 1',
+        [post_id, user_id],
+    )
+    return cursor.fetchone() is not None
+
+
+def _insert(cursor, post_id, user_id):
+    cursor.execute(
+        f'INSERT INTO {TABLE} ({POST_COLUMN}, {USER_COLUMN}) VALUES (%s, %s) '
+        f'ON CONFLICT ({POST_COLUMN}, {USER_COLUMN}) DO NOTHING RETURNING 1',
+        [post_id, user_id],
+    )
+    return cursor.fetchone() is not None
+
+
+def set_like(post_id, user_id, action=None):
+    """
+    Like, unlike or (``action=None``) toggle a post for a user.
+
+    ``like`` and ``unlike`` are idempotent, so a retried or doubled request
+    can't flip the state back. Returns ``(liked, like_count)``.
+    """
+    post_table = Post._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        delta = 0
+        if action == LIKE:
+            liked = True
+            delta = 1 if _insert(cursor, post_id, user_id) else 0
+        elif action == UNLIKE:
+            liked = False
+            delta = -1 if _delete(cursor, post_id, user_id) else 0
+        elif _delete(cursor, post_id, user_id):
+            liked, delta = False, -1
+        else:
+            # Nothing to delete, so like it. If a concurrent request inserted
+            # the row in between, ON CONFLICT keeps this one a no-op.
+            liked = True
+            delta = 1 if _insert(cursor, post_id, user_id) else 0
+
+        if delta:
+            cursor.execute(
+                f'UPDATE {post_table} SET like_count = like_count + %s WHERE id = %s RETURNING like_count',
+                [delta, post_id],
+            )
+        else:
+            cursor.execute(f'SELECT like_count FROM {post_table} WHERE id = %s', [post_id])
+        like_count = cursor.fetchone()[0]
+        if delta:
+            record_activity({post_id: delta}, 'likes')
+    return liked, like_count
+
+
+def liked_post_ids(user, post_ids):
+    """The subset of ``post_ids`` liked by ``user``, in one query."""
+    if not user.is_authenticated or not post_ids:
+        return set()
+    return set(
+        Through.objects.filter(customuser_id=user.pk, post_id__in=post_ids)
+        .values_list('post_id', flat=True)
+    )
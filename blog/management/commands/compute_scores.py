@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from blog import trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute time-decayed trending scores from the hourly activity "
+        "buckets. With --schedule, also make sure a recurring "
+        "blog.compute_trending_scores job is queued for run_worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true',
+                            help='Queue the recurring job if none is waiting.')
+
+    def handle(self, *args, **options):
+        scored = trending.compute_scores()
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} post(s) with recent activity.'))
+        if options['schedule']:
+            job = trending.schedule()
+            if job is None:
+                self.stdout.write('A recomputation job is already queued.')
+            else:
+                self.stdout.write(f'Queued {job}, due at {job.run_after:%Y-%m-%d %H:%M:%S}.')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import view_counter
+
+
+class Command(BaseCommand):
+    help = (
+        "Write buffered post view counts to the database. Needs a buffer shared "
+        "between processes (CacheBuffer on a cache such as Redis); the "
+        "in-process MemoryBuffer only holds the web workers' own hits."
+    )
+
+    def handle(self, *args, **options):
+        buffer = view_counter.get_buffer()
+        if not getattr(buffer, 'shared', True):
+            raise CommandError(
+                f'{type(buffer).__name__} keeps hits inside each web process, where they are '
+                'flushed every VIEW_COUNT_FLUSH_INTERVAL seconds; this process has none to flush. '
+                'Set VIEW_COUNT_BUFFER to blog.view_counter.CacheBuffer with a shared cache.'
+            )
+        written = view_counter.flush(everything=True)
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} view(s).'))
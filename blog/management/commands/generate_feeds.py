@@ -0,0 +1,57 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog import feeds, sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the sitemaps and RSS/Atom feeds to PREGENERATED_ROOT (with .gz "
+        "copies), e.g. for upload to a CDN. The site itself serves them from "
+        "the streaming views, which are always current."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Directory to write to (default: PREGENERATED_ROOT).')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        output = Path(options['output'] or settings.PREGENERATED_ROOT).resolve()
+        output.parent.mkdir(parents=True, exist_ok=True)
+        # Build a fresh tree and swap it in, so files of deleted categories,
+        # tags or authors don't linger and readers never see a partial file
+        staging = Path(tempfile.mkdtemp(prefix=f'.{output.name}-', dir=output.parent))
+        written = 0
+        try:
+            for documents in (sitemaps.documents(), feeds.documents()):
+                for path, _, chunks in documents:
+                    self._write(staging / path.lstrip('/'), chunks)
+                    written += 1
+            staging.chmod(0o755)
+            previous = output.with_name(f'.{output.name}-previous')
+            shutil.rmtree(previous, ignore_errors=True)
+            if output.exists():
+                os.replace(output, previous)
+            os.replace(staging, output)
+            shutil.rmtree(previous, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} file(s) to {output} in {time.monotonic() - started:.1f}s.'
+        ))
+
+    def _write(self, path, chunks):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as plain, gzip.GzipFile(f'{path}.gz', 'wb', mtime=0) as compressed:
+            for chunk in chunks:
+                data = chunk.encode()
+                plain.write(data)
+                compressed.write(data)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for all published posts."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} post(s) with {backend.__class__.__name__}.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized like, comment and published-post counters."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = counters.recount_all()
+        for label, rows in results.items():
+            self.stdout.write(f'{label}: {rows} row(s) recounted')
+        self.stdout.write(self.style.SUCCESS('Counters are up to date.'))
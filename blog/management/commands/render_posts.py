@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+
+# The reading time is counted from the rendered HTML, so it moves with it
+FIELDS = ['content_rendered', 'content_rendered_hash', 'word_count', 'reading_time']
+
+
+class Command(BaseCommand):
+    help = "Pre-render Markdown post bodies whose stored HTML is missing or stale."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render every Markdown post.')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.filter(content_type='markdown')
+            .only('pk', 'content_type', 'content_markdown', 'content_rendered_hash', 'word_count', 'reading_time')
+            .order_by('pk')
+        )
+        batch_size = options['batch_size']
+        batch = []
+        rendered = 0
+        for post in posts.iterator(chunk_size=batch_size):
+            if options['force']:
+                post.content_rendered_hash = ''
+            if post.render_content():
+                post.count_words()
+                batch.append(post)
+            if len(batch) >= batch_size:
+                Post.objects.bulk_update(batch, FIELDS)
+                rendered += len(batch)
+                batch = []
+        if batch:
+            Post.objects.bulk_update(batch, FIELDS)
+            rendered += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} post(s).'))
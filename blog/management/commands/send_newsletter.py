@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.models import NewsletterIssue, Post
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Create a newsletter issue from recent posts and queue it for sending."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subject', required=True)
+        parser.add_argument('--intro', default='')
+        parser.add_argument('--days', type=int, default=7,
+                            help='Include posts published in the last N days.')
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        post_ids = list(
+            Post.objects.filter(status='published', published_at__gte=since)
+            .order_by('-published_at')
+            .values_list('pk', flat=True)[:options['limit']]
+        )
+        issue = NewsletterIssue.objects.create(subject=options['subject'], intro=options['intro'])
+        issue.posts.set(post_ids)
+        jobs.enqueue('blog.send_newsletter_issue', {'issue_id': issue.pk})
+        self.stdout.write(self.style.SUCCESS(
+            f'Issue #{issue.pk} with {len(post_ids)} post(s) queued; run_worker will send it.'
+        ))
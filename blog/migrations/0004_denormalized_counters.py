@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 18:59
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, outer_field):
+    counted = (
+        queryset.filter(**{outer_field: OuterRef('pk')})
+        .order_by()
+        .values(outer_field)
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    Comment = apps.get_model('blog', 'Comment')
+
+    Post.objects.update(
+        like_count=_count(Post.likes.through.objects.all(), 'post_id'),
+        comment_count=_count(Comment.objects.filter(is_approved=True), 'post_id'),
+    )
+    Category.objects.update(
+        published_post_count=_count(Post.objects.filter(status='published'), 'category_id'),
+    )
+    Tag.objects.update(
+        published_post_count=_count(Post.tags.through.objects.filter(post__status='published'), 'tag_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_alter_newsletter_options_alter_post_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
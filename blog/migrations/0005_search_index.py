@@ -0,0 +1,86 @@
+# Generated by Django 5.2 on 2026-10-18 19:00
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+from django.utils.html import strip_tags
+
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE IF NOT EXISTS blog_post_search (
+        post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE,
+        vector tsvector
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS blog_post_search_vector_gin ON blog_post_search USING GIN (vector)",
+    """
+    INSERT INTO blog_post_search (post_id, vector)
+    SELECT id,
+           setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') ||
+           setweight(to_tsvector('english', CASE WHEN content_type = 'markdown'
+                                                 THEN content_markdown ELSE content_html END), 'C')
+    FROM blog_post
+    ON CONFLICT (post_id) DO NOTHING
+    """,
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts
+    USING fts5(title, excerpt, body, tokenize = 'porter unicode61')
+    """,
+]
+
+
+def create_search_storage(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQLITE_FORWARD:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5: blog.search falls back to icontains.
+            return
+        Post = apps.get_model('blog', 'Post')
+        rows = Post.objects.values_list('id', 'title', 'excerpt', 'content_type', 'content_html', 'content_markdown')
+        with schema_editor.connection.cursor() as cursor:
+            for pk, title, excerpt, content_type, html, markdown in rows.iterator():
+                body = markdown if content_type == 'markdown' else strip_tags(html)
+                cursor.execute(
+                    'INSERT INTO blog_post_fts (rowid, title, excerpt, body) VALUES (%s, %s, %s, %s)',
+                    [pk, title, excerpt, body],
+                )
+
+
+def drop_search_storage(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_post_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='blog.post')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+            options={
+                'db_table': 'blog_post_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_storage, drop_search_storage),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_rendered',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_rendered_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_keyset_pagination_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('intro', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('sending', 'Sending'), ('sent', 'Sent')], default='draft', max_length=10)),
+                ('last_subscriber_id', models.PositiveBigIntegerField(default=0)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('posts', models.ManyToManyField(blank=True, related_name='newsletter_issues', to='blog.post')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
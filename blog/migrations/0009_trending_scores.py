@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_newsletter_issue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.IntegerField(default=0)),
+                ('likes', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Post activity',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-score', '-id'], name='blog_post_status_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='postactivity',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='blog.post'),
+        ),
+        migrations.AddIndex(
+            model_name='postactivity',
+            index=models.Index(fields=['hour'], name='blog_postac_hour_d68d20_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postactivity',
+            constraint=models.UniqueConstraint(fields=('post', 'hour'), name='blog_postactivity_post_hour_uniq'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 19:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_trending_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='blog.post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_in', to='blog.post')),
+            ],
+            options={
+                'ordering': ['post', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'rank'), name='blog_relatedpost_post_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_related_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='featured_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def backfill_word_counts(apps, schema_editor):
+    from blog.rendering import count_words, reading_minutes, render_markdown
+
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.only('pk', 'content_type', 'content_html', 'content_markdown', 'content_rendered').order_by('pk')
+    batch = []
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        if post.content_type == 'markdown':
+            html = post.content_rendered or render_markdown(post.content_markdown)
+        else:
+            html = post.content_html
+        post.word_count = count_words(html)
+        post.reading_time = reading_minutes(post.word_count)
+        batch.append(post)
+        if len(batch) >= BATCH_SIZE:
+            Post.objects.bulk_update(batch, ['word_count', 'reading_time'])
+            batch = []
+    Post.objects.bulk_update(batch, ['word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_word_counts, migrations.RunPython.noop),
+    ]
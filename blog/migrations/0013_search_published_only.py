@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 21:10
+
+from django.db import migrations
+
+
+def drop_unpublished_rows(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        table, column = 'blog_post_search', 'post_id'
+    elif connection.vendor == 'sqlite' and 'blog_post_fts' in connection.introspection.table_names():
+        table, column = 'blog_post_fts', 'rowid'
+    else:
+        return
+    schema_editor.execute(
+        f"DELETE FROM {table} WHERE {column} NOT IN (SELECT id FROM blog_post WHERE status = 'published')"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_reading_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_unpublished_rows, migrations.RunPython.noop),
+    ]
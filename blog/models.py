@@ -1,6 +1,9 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.utils.text import slugify
 from tinymce.models import HTMLField
 from markdownx.models import MarkdownxField
@@ -13,6 +16,9 @@ class Category(models.Model):
     color = models.CharField(max_length=20, default='blue', help_text="Tailwind color name")
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Maintained by blog.signals; repair with `manage.py recount`
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
+    
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
@@ -29,12 +35,15 @@ class Category(models.Model):
         return reverse('blog:category_posts', kwargs={'slug': self.slug})
     
     def post_count(self):
-        return self.posts.filter(status='published').count()
+        return self.published_post_count
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=50, unique=True, blank=True)
     
+    # Maintained by blog.signals; repair with `manage.py recount`
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
+    
     class Meta:
         ordering = ['name']
     
@@ -49,6 +58,41 @@ class Tag(models.Model):
     def get_absolute_url(self):
         return reverse('blog:tag_posts', kwargs={'slug': self.slug})
 
+class PostQuerySet(models.QuerySet):
+    def trending(self, window=None):
+        """
+        Published posts by decayed popularity score (see blog.trending).
+
+        ``window`` is a timedelta restricting the posts to those published
+        that recently. The order is served by ``blog_post_status_score_idx``.
+        """
+        posts = self.filter(status='published')
+        if window is not None:
+            posts = posts.filter(published_at__gte=timezone.now() - window)
+        return posts.order_by('-score', '-id')
+    
+    def related_to(self, post):
+        """
+        Published posts precomputed as similar to ``post`` (see blog.related),
+        most similar first: one join served by the (post, rank) index.
+        """
+        return self.filter(status='published', related_in__post=post).order_by('related_in__rank')
+    
+    def without_content(self):
+        """Skip the body columns, which listings and cards never show."""
+        return self.defer(*Post.BODY_FIELDS)
+    
+    def cards(self):
+        """
+        Lightweight ``PostCard`` objects instead of posts (see blog.cards):
+        only the columns a listing card shows, author and category joined
+        in, tags in one extra query.
+        """
+        from .cards import COLUMNS, PostCardIterable
+        queryset = self.values(*COLUMNS)
+        queryset._iterable_class = PostCardIterable
+        return queryset
+
 class Post(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -60,6 +104,9 @@ class Post(models.Model):
         ('markdown', 'Markdown'),
     ]
     
+    # Large text columns; see PostQuerySet.without_content
+    BODY_FIELDS = ('content_html', 'content_markdown', 'content_rendered')
+    
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
@@ -68,31 +115,61 @@ class Post(models.Model):
     
     excerpt = models.TextField(max_length=300, blank=True)
     featured_image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Resized copies of featured_image, see core.images
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     content_type = models.CharField(max_length=10, choices=CONTENT_TYPE_CHOICES, default='html')
     content_html = HTMLField(blank=True)
     content_markdown = MarkdownxField(blank=True)
     
+    # Pre-rendered Markdown body, see blog.rendering
+    content_rendered = models.TextField(blank=True, editable=False)
+    content_rendered_hash = models.CharField(max_length=64, blank=True, editable=False)
+    
+    # Counted from the body's text on save, so listings needn't load it
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=1, editable=False)
+    
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     is_featured = models.BooleanField(default=False)
     
     views = models.PositiveIntegerField(default=0)
     likes = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name='liked_posts')
     
+    # Maintained by blog.signals; repair with `manage.py recount`
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Time-decayed popularity, recomputed on a schedule by blog.trending
+    score = models.FloatField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
     
+    objects = PostQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-published_at', '-created_at']
         indexes = [
             models.Index(fields=['-published_at']),
             models.Index(fields=['status']),
+            # Keyset pagination order, see blog.pagination
+            models.Index(fields=['status', '-published_at', '-id'], name='blog_post_status_pub_id_idx'),
+            # Trending and popular lists, see PostQuerySet.trending
+            models.Index(fields=['status', '-score', '-id'], name='blog_post_status_score_idx'),
         ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'content_type', 'content_markdown'} & set(update_fields):
+            if self.render_content() and update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'content_rendered', 'content_rendered_hash'}
+        if update_fields is None or {'content_type', 'content_html', 'content_markdown'} & set(update_fields):
+            if self.count_words() and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'word_count', 'reading_time'}
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -106,13 +183,101 @@ class Post(models.Model):
             return self.content_markdown
         return self.content_html
     
-    def reading_time(self):
-        content = self.get_content()
-        words = len(content.split())
-        return max(1, words // 200)
+    def render_content(self):
+        """Re-render the Markdown body if stale. Returns True if it changed."""
+        from .rendering import content_hash, render_markdown
+        if self.content_type != 'markdown':
+            return False
+        source_hash = content_hash(self.content_markdown)
+        if source_hash == self.content_rendered_hash:
+            return False
+        self.content_rendered = render_markdown(self.content_markdown)
+        self.content_rendered_hash = source_hash
+        return True
+    
+    def rendered_content(self):
+        """HTML body for templates; renders and stores it on a cache miss."""
+        if self.content_type != 'markdown':
+            return mark_safe(self.content_html)
+        if self.render_content() and self.pk:
+            Post.objects.filter(pk=self.pk).update(
+                content_rendered=self.content_rendered,
+                content_rendered_hash=self.content_rendered_hash,
+            )
+        return mark_safe(self.content_rendered)
+    
+    def count_words(self):
+        """Recount ``word_count`` and ``reading_time``. Returns True if they changed."""
+        from .rendering import count_words, reading_minutes
+        html = self.content_rendered if self.content_type == 'markdown' else self.content_html
+        word_count = count_words(html)
+        if word_count == self.word_count and self.reading_time == reading_minutes(word_count):
+            return False
+        self.word_count = word_count
+        self.reading_time = reading_minutes(word_count)
+        return True
+
+class PostActivity(models.Model):
+    """
+    Views, likes and comments a post got in one hour, the input of the
+    trending scores. Rows are upserted by blog.trending and pruned once they
+    fall out of the scoring horizon.
+    """
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name='activity',
+        # View counts are flushed in batches and may still name a post that
+        # was deleted meanwhile; such rows are ignored and pruned.
+        db_constraint=False,
+    )
+    hour = models.DateTimeField()
+    views = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = 'Post activity'
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'hour'], name='blog_postactivity_post_hour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id} @ {self.hour:%Y-%m-%d %H:00}'
+
+class RelatedPost(models.Model):
+    """One entry of a post's precomputed related-posts list, see blog.related."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_in')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['post', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='blog_relatedpost_post_rank_uniq'),
+        ]
     
-    def like_count(self):
-        return self.likes.count()
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.3f})'
+
+class PostSearchDocument(models.Model):
+    """
+    Stored, GIN-indexed tsvector for a post (PostgreSQL only).
+
+    The table is created by a vendor-aware migration and kept up to date by
+    blog.search; on SQLite an FTS5 virtual table is used instead.
+    """
+    post = models.OneToOneField(
+        Post, primary_key=True, on_delete=models.DO_NOTHING,
+        related_name='search_document', db_constraint=False,
+    )
+    vector = SearchVectorField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'blog_post_search'
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
@@ -130,7 +295,11 @@ class Comment(models.Model):
         return f'Comment by {self.author.username} on {self.post.title}'
     
     def children(self):
-        return Comment.objects.filter(parent=self)
+        # Filled in by blog.comments.load_comment_tree without extra queries
+        if hasattr(self, '_tree_children'):
+            return self._tree_children
+        # Same rules as the tree: only approved replies are shown
+        return self.replies.filter(is_approved=True).select_related('author')
 
 class Newsletter(models.Model):
     email = models.EmailField(unique=True)
@@ -138,4 +307,29 @@ class Newsletter(models.Model):
     is_active = models.BooleanField(default=True)
     
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class NewsletterIssue(models.Model):
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+    ]
+    
+    subject = models.CharField(max_length=200)
+    intro = models.TextField(blank=True)
+    posts = models.ManyToManyField(Post, blank=True, related_name='newsletter_issues')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
+    # Resume point: subscribers are sent to in primary key order
+    last_subscriber_id = models.PositiveBigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.subject
@@ -0,0 +1,82 @@
+# blog/newsletter.py
+"""
+Newsletter dispatch, run from the ``blog.send_newsletter_issue`` job.
+
+The digest is rendered once per issue and template, not once per
+subscriber. Subscribers are streamed in primary key order with
+``iterator(chunk_size=...)``, and every batch goes out over one SMTP
+connection that stays open for the whole run. After each batch the
+issue records the last subscriber id it reached. A crashed or retried
+job carries on from there. At worst it resends the one batch that was
+in flight. Each batch also refreshes the job's lock (``core.jobs.heartbeat``),
+so a long send isn't requeued and picked up by a second worker.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.jobs import heartbeat
+
+from .models import Newsletter, NewsletterIssue
+
+
+def render_issue(issue):
+    context = {
+        'issue': issue,
+        'posts': issue.posts.filter(status='published').select_related('author', 'category').order_by('-published_at'),
+        'site_url': settings.SITE_URL.rstrip('/'),
+    }
+    return (
+        render_to_string('blog/email/newsletter_issue.txt', context),
+        render_to_string('blog/email/newsletter_issue.html', context),
+    )
+
+
+def _send_batch(issue, connection, text, html, batch):
+    messages = []
+    for _, email in batch:
+        message = EmailMultiAlternatives(issue.subject, text, settings.DEFAULT_FROM_EMAIL, [email], connection=connection)
+        message.attach_alternative(html, 'text/html')
+        messages.append(message)
+    connection.send_messages(messages)
+    NewsletterIssue.objects.filter(pk=issue.pk).update(
+        last_subscriber_id=batch[-1][0],
+        sent_count=F('sent_count') + len(batch),
+    )
+    heartbeat()
+
+
+def dispatch_issue(issue_id, batch_size=None):
+    """Send an issue to every active subscriber not reached yet."""
+    issue = NewsletterIssue.objects.get(pk=issue_id)
+    if issue.status == 'sent':
+        return 0
+    batch_size = batch_size or getattr(settings, 'NEWSLETTER_BATCH_SIZE', 200)
+    NewsletterIssue.objects.filter(pk=issue.pk, started_at__isnull=True).update(started_at=timezone.now())
+    NewsletterIssue.objects.filter(pk=issue.pk).update(status='sending')
+
+    text, html = render_issue(issue)
+    subscribers = (
+        Newsletter.objects.filter(is_active=True, pk__gt=issue.last_subscriber_id)
+        .order_by('pk')
+        .values_list('pk', 'email')
+        .iterator(chunk_size=batch_size)
+    )
+
+    sent = 0
+    with get_connection() as connection:
+        batch = []
+        for subscriber in subscribers:
+            batch.append(subscriber)
+            if len(batch) >= batch_size:
+                _send_batch(issue, connection, text, html, batch)
+                sent += len(batch)
+                batch = []
+        if batch:
+            _send_batch(issue, connection, text, html, batch)
+            sent += len(batch)
+
+    NewsletterIssue.objects.filter(pk=issue.pk).update(status='sent', finished_at=timezone.now())
+    return sent
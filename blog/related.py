@@ -0,0 +1,392 @@
+# blog/related.py
+"""
+Precomputed "Related posts".
+
+Each published post is a sparse TF-IDF vector over its tags, its category
+and the terms in its title, normalised to unit length, so the similarity
+of two posts is the cosine of their vectors. The vectors are the rows of
+a SciPy CSR matrix and similarities are sparse matrix products, computed
+for ``BLOCK_SIZE`` posts at a time. A post is only compared with posts
+that share a feature with it, never with the whole table.
+
+Features so common that more than ``RELATED_POSTS_MAX_POSTINGS`` posts
+have them (a large category, say) still count towards the score of every
+candidate. They only contribute their most recent posts as new
+candidates, which keeps a full rebuild roughly linear in the number of
+posts.
+
+The top ``RELATED_POSTS_LIMIT`` matches are stored as ``RelatedPost`` rows
+and served by ``Post.objects.related_to(post)``. The rows are written:
+
+* all at once by ``manage.py compute_related_posts``, which should also
+  run periodically to repair lists thinned out by deleted posts;
+* per post by the ``blog.update_related_posts`` job. It is queued when a
+  published post's title, category, tags or status change, recomputes
+  that post's list and updates the lists of the posts it now belongs in.
+  Bulk changes from the admin queue one ``blog.rebuild_related_posts``
+  job instead once more than ``BULK_REBUILD_THRESHOLD`` posts changed.
+
+The worker keeps its corpus between jobs and only replaces the rows of
+the changed post and of posts other workers updated since (found through
+their finished jobs). It is loaded again when the number of published
+posts disagrees with it, after a rebuild and once it is older than
+``RELATED_CORPUS_MAX_AGE`` seconds, which catches changes that bypassed
+the signals.
+"""
+import re
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Post, RelatedPost
+from .signals import related_posts_updated
+
+TASK_NAME = 'blog.update_related_posts'
+REBUILD_TASK_NAME = 'blog.rebuild_related_posts'
+BULK_REBUILD_THRESHOLD = 50
+
+FEATURE_WEIGHTS = {'tag': 1.0, 'category': 0.5, 'term': 0.5}
+CARD_FIELDS = ('title', 'slug', 'excerpt', 'featured_image', 'featured_image_variants')
+BATCH_SIZE = 2000
+# Posts whose similarities are computed in one matrix product
+BLOCK_SIZE = 500
+# Allowance for clock differences between workers when replaying their jobs
+SYNC_SLACK = timedelta(minutes=1)
+
+STOPWORDS = frozenset("""
+    about after all and are but can for from has have how into its not our
+    than that the their them then this what when where which who why will
+    with you your
+""".split())
+TERM_RE = re.compile(r'[^\W_]+')
+
+# This process's corpus: (loaded at, synced at, Corpus)
+_corpus = None
+
+
+def limit():
+    return getattr(settings, 'RELATED_POSTS_LIMIT', 6)
+
+
+def max_postings():
+    return getattr(settings, 'RELATED_POSTS_MAX_POSTINGS', 500)
+
+
+def max_age():
+    return getattr(settings, 'RELATED_CORPUS_MAX_AGE', 3600)
+
+
+def title_terms(title):
+    return {term for term in TERM_RE.findall(title.lower()) if len(term) > 2 and term not in STOPWORDS}
+
+
+def _first_of_group(keys):
+    """For sorted ``keys``, the index where each element's run of equal keys starts."""
+    return np.searchsorted(keys, keys, side='left')
+
+
+class Corpus:
+    """
+    Unit-length TF-IDF vectors of published posts, one sparse row per post.
+
+    ``weights`` holds the raw feature weights. ``_reweigh`` derives the
+    TF-IDF ``vectors`` from it and splits them into ``proposers`` (with
+    each common feature kept only for its most recent posts) and
+    ``stale``, the common-feature entries left out, which ``common``
+    (every common-feature entry) is multiplied with to complete a score.
+    """
+
+    def __init__(self, features, max_postings):
+        # features: {post_id: {feature: weight}}, most recent post first.
+        # Features are numbered as matrix columns.
+        self.max_postings = max_postings
+        self.columns = {}
+        self.rows = {post_id: row for row, post_id in enumerate(features)}
+        indptr = [0]
+        indices = []
+        data = []
+        for post_features in features.values():
+            for feature, weight in post_features.items():
+                indices.append(self.columns.setdefault(feature, len(self.columns)))
+                data.append(weight)
+            indptr.append(len(indices))
+        self.post_ids = np.fromiter(features, dtype=np.int64, count=len(features))
+        # Lower is more recent
+        self.recency = np.arange(len(features), dtype=np.int64)
+        self.published = np.ones(len(features), dtype=bool)
+        self.weights = sparse.csr_array(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(features), len(self.columns)),
+        )
+        self._reweigh()
+
+    def __len__(self):
+        return int(self.published.sum())
+
+    def _reweigh(self):
+        weights = self.weights
+        size, width = weights.shape
+        indices = weights.indices
+        entry_rows = np.repeat(np.arange(size), np.diff(weights.indptr))
+
+        df = np.bincount(indices, minlength=width)
+        idf = np.log((1 + len(self)) / (1 + df)) + 1
+        data = weights.data * idf[indices]
+        norms = np.sqrt(np.bincount(entry_rows, weights=data * data, minlength=size))
+        data /= np.where(norms > 0, norms, 1.0)[entry_rows]
+        self.vectors = sparse.csr_array((data, indices, weights.indptr), shape=weights.shape)
+
+        # Common features only propose their max_postings most recent posts;
+        # their products with the other, stale, posts are added per match
+        common = df[indices] > self.max_postings
+        keep = ~common
+        if common.any():
+            entries = np.flatnonzero(common)
+            entries = entries[np.lexsort((self.recency[entry_rows[entries]], indices[entries]))]
+            columns = indices[entries]
+            rank = np.arange(len(entries)) - _first_of_group(columns)
+            keep[entries[rank < self.max_postings]] = True
+
+        def part(mask):
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(entry_rows[mask], minlength=size))))
+            return sparse.csr_array((data[mask], indices[mask], indptr), shape=weights.shape)
+
+        self.proposers = part(keep)
+        self.common = part(common)
+        self.stale = part(~keep)
+
+    def update(self, changes):
+        """Apply ``{post_id: {feature: weight}}``; ``None`` features drop the post."""
+        for post_id, features in changes.items():
+            row = self.rows.get(post_id)
+            if row is None:
+                if features is None:
+                    continue
+                row = self._append(post_id)
+            self._replace_row(row, features or {})
+            self.published[row] = features is not None
+        self._reweigh()
+
+    def _append(self, post_id):
+        row = len(self.post_ids)
+        self.rows[post_id] = row
+        self.post_ids = np.append(self.post_ids, post_id)
+        # Posts are added as they are published, so the newest is the most recent
+        self.recency = np.append(self.recency, self.recency.min(initial=0) - 1)
+        self.published = np.append(self.published, False)
+        weights = self.weights
+        indptr = np.append(weights.indptr, weights.indptr[-1])
+        self.weights = sparse.csr_array(
+            (weights.data, weights.indices, indptr), shape=(row + 1, weights.shape[1]),
+        )
+        return row
+
+    def _replace_row(self, row, features):
+        weights = self.weights
+        start, end = weights.indptr[row], weights.indptr[row + 1]
+        columns = np.array([self.columns.setdefault(feature, len(self.columns)) for feature in features], dtype=np.int64)
+        indptr = weights.indptr.copy()
+        indptr[row + 1:] += len(columns) - (end - start)
+        self.weights = sparse.csr_array(
+            (
+                np.concatenate((weights.data[:start], np.fromiter(features.values(), dtype=np.float64), weights.data[end:])),
+                np.concatenate((weights.indices[:start], columns, weights.indices[end:])),
+                indptr,
+            ),
+            shape=(weights.shape[0], len(self.columns)),
+        )
+
+    def matches(self, rows, limit=None):
+        """
+        ``(post_ids, related_ids, scores, ranks)`` arrays of the posts at
+        ``rows``, each post's matches best first; all matches if no ``limit``.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        found = (self.vectors[rows] @ self.proposers.T).tocoo()
+        position, other = found.coords
+        scores = found.data
+        if self.stale.nnz:
+            scores = scores + (self.common[rows[position]] * self.stale[other]).sum(axis=1)
+        keep = (other != rows[position]) & (scores > 0)
+        position, other, scores = position[keep], other[keep], scores[keep]
+
+        # Similarities are at most 1, so this sorts by row, then best first
+        order = np.argsort(position - scores / 2, kind='stable')
+        position, other, scores = position[order], other[order], scores[order]
+        ranks = np.arange(len(position)) - _first_of_group(position)
+        if limit is not None:
+            keep = ranks < limit
+            position, other, scores, ranks = position[keep], other[keep], scores[keep], ranks[keep]
+        return self.post_ids[rows[position]], self.post_ids[other], scores, ranks
+
+    def similar(self, post_id, limit=None):
+        """``(other_id, similarity)`` pairs, best first; all matches if no ``limit``."""
+        row = self.rows.get(post_id)
+        if row is None or not self.published[row]:
+            return []
+        _, others, scores, _ = self.matches([row], limit)
+        return list(zip(others.tolist(), scores.tolist()))
+
+
+def post_features(posts):
+    """``{post_id: {feature: weight}}`` of ``posts``, most recent first, with two streaming queries."""
+    features = {}
+    rows = posts.order_by('-published_at', '-pk').values_list('pk', 'title', 'category_id')
+    for pk, title, category_id in rows.iterator(chunk_size=BATCH_SIZE):
+        post_features = {('term', term): FEATURE_WEIGHTS['term'] for term in title_terms(title)}
+        if category_id is not None:
+            post_features[('category', category_id)] = FEATURE_WEIGHTS['category']
+        features[pk] = post_features
+
+    tags = Post.tags.through.objects.filter(post__in=posts.order_by().values('pk')).values_list('post_id', 'tag_id')
+    for post_id, tag_id in tags.iterator(chunk_size=BATCH_SIZE):
+        if post_id in features:
+            features[post_id][('tag', tag_id)] = FEATURE_WEIGHTS['tag']
+    return features
+
+
+def load_corpus():
+    """Build the ``Corpus`` of all published posts."""
+    return Corpus(post_features(Post.objects.filter(status='published')), max_postings())
+
+
+def _load():
+    global _corpus
+    now = timezone.now()
+    corpus = load_corpus()
+    _corpus = (time.monotonic(), now, corpus)
+    return corpus
+
+
+def _current_corpus(post_id):
+    """This process's corpus, with ``post_id`` and other workers' updates applied."""
+    global _corpus
+    from core.models import Job
+
+    if _corpus is None or time.monotonic() - _corpus[0] > max_age():
+        return _load()
+    loaded_at, synced_at, corpus = _corpus
+    now = timezone.now()
+    finished = Job.objects.filter(
+        name__in=(TASK_NAME, REBUILD_TASK_NAME), status=Job.DONE, finished_at__gte=synced_at - SYNC_SLACK,
+    ).order_by().values_list('name', 'payload')
+    changed = {post_id}
+    for name, payload in finished:
+        if name == REBUILD_TASK_NAME:
+            return _load()
+        changed.add(payload['post_id'])
+    changed = list(changed)
+    for start in range(0, len(changed), BATCH_SIZE):
+        ids = changed[start:start + BATCH_SIZE]
+        features = post_features(Post.objects.filter(pk__in=ids, status='published'))
+        corpus.update({pk: features.get(pk) for pk in ids})
+    # Deleted posts and changes that bypassed the signals
+    if len(corpus) != Post.objects.filter(status='published').count():
+        return _load()
+    _corpus = (loaded_at, now, corpus)
+    return corpus
+
+
+def _entries(corpus, post_ids, size):
+    rows = [corpus.rows[post_id] for post_id in post_ids if post_id in corpus.rows]
+    entries = []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        entries += [
+            RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+            for post_id, related_id, score, rank in zip(
+                *(values.tolist() for values in corpus.matches(rows[start:start + BLOCK_SIZE], size))
+            )
+        ]
+    return entries
+
+
+def _replace(corpus, post_ids, size):
+    for start in range(0, len(post_ids), BATCH_SIZE):
+        RelatedPost.objects.filter(post_id__in=post_ids[start:start + BATCH_SIZE]).delete()
+    RelatedPost.objects.bulk_create(_entries(corpus, post_ids, size), batch_size=BATCH_SIZE)
+
+
+def rebuild_all():
+    """Recompute every list; returns the number of posts indexed."""
+    corpus = _load()
+    size = limit()
+    post_ids = corpus.post_ids.tolist()
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        for start in range(0, len(post_ids), BLOCK_SIZE):
+            RelatedPost.objects.bulk_create(_entries(corpus, post_ids[start:start + BLOCK_SIZE], size))
+    return len(corpus)
+
+
+def update_post(post_id):
+    """
+    Recompute the list of ``post_id`` and of every post whose list it
+    joins or leaves. Returns the ids of the lists that were rewritten.
+    """
+    corpus = _current_corpus(post_id)
+    size = limit()
+    # Lists that currently show the post may lose it or reorder
+    affected = set(RelatedPost.objects.filter(related_id=post_id).values_list('post_id', flat=True))
+
+    candidates = dict(corpus.similar(post_id))
+    ids = list(candidates)
+    for start in range(0, len(ids), BATCH_SIZE):
+        current = (
+            RelatedPost.objects.filter(post_id__in=ids[start:start + BATCH_SIZE])
+            .values('post_id').annotate(n=Count('*'), worst=Min('score'))
+            .values_list('post_id', 'n', 'worst')
+        )
+        full = {other: worst for other, n, worst in current if n >= size}
+        # The post joins every list that has room or a weaker last entry
+        affected.update(other for other in ids[start:start + BATCH_SIZE]
+                        if other not in full or candidates[other] > full[other])
+
+    with transaction.atomic():
+        _replace(corpus, [post_id, *affected], size)
+    related_posts_updated.send(sender=None, post_ids=[post_id, *affected])
+    return [post_id, *affected]
+
+
+def schedule_update(post_id):
+    """Queue ``update_post`` for ``post_id`` unless it is already waiting."""
+    from core.jobs import enqueue
+    from core.models import Job
+
+    if Job.objects.filter(name=TASK_NAME, status=Job.QUEUED, payload__post_id=post_id).exists():
+        return None
+    return enqueue(TASK_NAME, {'post_id': post_id})
+
+
+def schedule_updates(post_ids):
+    """Queue updates for many posts: one per post, or a full rebuild for a lot."""
+    from core.jobs import enqueue
+    from core.models import Job
+
+    post_ids = list(post_ids)
+    if len(post_ids) <= BULK_REBUILD_THRESHOLD:
+        for post_id in post_ids:
+            schedule_update(post_id)
+        return None
+    if Job.objects.filter(name=REBUILD_TASK_NAME, status=Job.QUEUED).exists():
+        return None
+    return enqueue(REBUILD_TASK_NAME)
+
+
+def related_posts(post, count=3):
+    """
+    The stored related posts of ``post``. Posts that haven't been indexed
+    yet fall back to other posts in the same category.
+    """
+    posts = list(Post.objects.related_to(post).only(*CARD_FIELDS)[:count])
+    if not posts and post.category_id is not None:
+        posts = list(
+            Post.objects.filter(status='published', category=post.category_id)
+            .exclude(pk=post.pk).only(*CARD_FIELDS)[:count]
+        )
+    return posts
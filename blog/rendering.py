@@ -0,0 +1,58 @@
+# blog/rendering.py
+"""
+Markdown rendering shared by the ``markdown`` template filter and the
+pre-rendered ``Post.content_rendered`` column, and the plain-text word
+count behind ``Post.word_count``/``Post.reading_time``.
+
+``codehilite`` runs Pygments over every code block, which is far too slow
+to repeat on each page view. Posts store their rendered HTML together with
+a hash of the source *and* the renderer configuration, so changing the
+extensions (or bumping ``RENDER_VERSION``) invalidates every stored body.
+"""
+import hashlib
+import json
+from html import unescape
+
+import markdown as md
+from django.utils.html import strip_tags
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite']
+MARKDOWN_EXTENSION_CONFIGS = {}
+
+WORDS_PER_MINUTE = 200
+
+# Bump to force re-rendering when output changes for reasons the hash
+# cannot see (e.g. a Pygments upgrade).
+RENDER_VERSION = 1
+
+_CONFIG_FINGERPRINT = json.dumps(
+    [RENDER_VERSION, md.__version__, MARKDOWN_EXTENSIONS, MARKDOWN_EXTENSION_CONFIGS],
+    sort_keys=True,
+)
+
+
+def render_markdown(text):
+    return md.markdown(
+        text or '',
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+    )
+
+
+def content_hash(text):
+    digest = hashlib.sha256(_CONFIG_FINGERPRINT.encode())
+    digest.update((text or '').encode())
+    return digest.hexdigest()
+
+
+def plain_text(html):
+    """Visible text of an HTML fragment: tags stripped, entities decoded."""
+    return unescape(strip_tags(html or ''))
+
+
+def count_words(html):
+    return len(plain_text(html).split())
+
+
+def reading_minutes(word_count):
+    return max(1, word_count // WORDS_PER_MINUTE)
@@ -0,0 +1,214 @@
+# blog/search.py
+"""
+Pluggable full-text search for posts.
+
+``post_list`` used to OR four ``icontains`` filters together, which is a
+``LIKE '%q%'`` scan over the largest text columns and cannot rank results.
+Backends:
+
+* ``PostgresSearchBackend`` – ``SearchQuery``/``SearchRank`` against the
+  stored, GIN-indexed tsvector in ``blog_post_search``.
+* ``SQLiteFTSSearchBackend`` – SQLite FTS5 with bm25 ranking, for local
+  development and tests.
+* ``BasicSearchBackend`` – the old ``icontains`` behaviour, used when
+  neither of the above is available.
+
+``BLOG_SEARCH_BACKEND`` may name a backend class explicitly; otherwise one
+is picked from the database vendor. The index is updated from
+``blog.signals`` on save and rebuilt by ``manage.py rebuild_search_index``.
+It holds published posts only: a post's row is dropped when it leaves
+``published``, so drafts never take up the FTS5 backend's
+``BLOG_SEARCH_MAX_RESULTS`` slots ahead of the caller's filters.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+INDEX_CHUNK_SIZE = 500
+
+
+def post_body(content_type, content_html, content_markdown):
+    if content_type == 'markdown':
+        return content_markdown or ''
+    return strip_tags(content_html or '')
+
+
+class BasicSearchBackend:
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(excerpt__icontains=query) |
+            Q(content_html__icontains=query) |
+            Q(content_markdown__icontains=query)
+        )
+
+    def index_posts(self, post_ids):
+        pass
+
+    def remove_posts(self, post_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    upsert_sql = """
+        INSERT INTO blog_post_search (post_id, vector)
+        SELECT id,
+               setweight(to_tsvector(%(config)s, coalesce(title, '')), 'A') ||
+               setweight(to_tsvector(%(config)s, coalesce(excerpt, '')), 'B') ||
+               setweight(to_tsvector(%(config)s, CASE WHEN content_type = 'markdown'
+                                                     THEN content_markdown ELSE content_html END), 'C')
+        FROM blog_post
+        WHERE status = 'published' {where}
+        ON CONFLICT (post_id) DO UPDATE SET vector = EXCLUDED.vector
+    """
+
+    def __init__(self):
+        self.config = getattr(settings, 'BLOG_SEARCH_CONFIG', 'english')
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        return (
+            queryset.filter(search_document__vector=search_query)
+            .annotate(search_rank=SearchRank(F('search_document__vector'), search_query))
+            .order_by('-search_rank', '-published_at')
+        )
+
+    def index_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if post_ids:
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM blog_post_search WHERE post_id = ANY(%s)', [post_ids])
+                cursor.execute(
+                    self.upsert_sql.format(where='AND id = ANY(%(ids)s)'),
+                    {'config': self.config, 'ids': post_ids},
+                )
+
+    def remove_posts(self, post_ids):
+        # Rows go away with the post through ON DELETE CASCADE.
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE blog_post_search')
+            cursor.execute(self.upsert_sql.format(where=''), {'config': self.config})
+            return cursor.rowcount
+
+
+class SQLiteFTSSearchBackend(BasicSearchBackend):
+    table = 'blog_post_fts'
+    # bm25 column weights for title, excerpt and body
+    weights = (10.0, 4.0, 1.0)
+    term_re = re.compile(r'\w+', re.UNICODE)
+    insert_sql = f'INSERT INTO {table} (rowid, title, excerpt, body) VALUES (%s, %s, %s, %s)'
+
+    def __init__(self):
+        self.max_results = getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 1000)
+
+    def match_expression(self, query):
+        # Quote every term so user input can't inject FTS5 syntax; the last
+        # term is a prefix match to behave well with partial words.
+        terms = self.term_re.findall(query)
+        if not terms:
+            return None
+        quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return queryset.none()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({self.table}, %s, %s, %s) AS rank FROM {self.table} '
+                f'WHERE {self.table} MATCH %s ORDER BY rank LIMIT %s',
+                [*self.weights, expression, self.max_results],
+            )
+            ranks = cursor.fetchall()
+        if not ranks:
+            return queryset.none()
+        # bm25 is "lower is better"; negate so ordering matches PostgreSQL.
+        rank = Case(
+            *[When(pk=pk, then=Value(-score)) for pk, score in ranks],
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(pk__in=[pk for pk, _ in ranks])
+            .annotate(search_rank=rank)
+            .order_by('-search_rank', '-published_at')
+        )
+
+    def _rows(self, queryset):
+        rows = queryset.values_list('pk', 'title', 'excerpt', 'content_type', 'content_html', 'content_markdown')
+        for pk, title, excerpt, content_type, html, markdown in rows.iterator(chunk_size=INDEX_CHUNK_SIZE):
+            yield pk, title, excerpt, post_body(content_type, html, markdown)
+
+    def index_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        self.remove_posts(post_ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                self.insert_sql, list(self._rows(Post.objects.filter(pk__in=post_ids, status='published'))),
+            )
+
+    def remove_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if post_ids:
+            placeholders = ', '.join(['%s'] * len(post_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', post_ids)
+
+    def rebuild(self):
+        count = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            batch = []
+            for row in self._rows(Post.objects.filter(status='published').order_by('pk')):
+                batch.append(row)
+                if len(batch) >= INDEX_CHUNK_SIZE:
+                    cursor.executemany(self.insert_sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(self.insert_sql, batch)
+                count += len(batch)
+        return count
+
+
+_backend = None
+
+
+def _sqlite_has_fts():
+    return SQLiteFTSSearchBackend.table in connection.introspection.table_names()
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == 'sqlite' and _sqlite_has_fts():
+            _backend = SQLiteFTSSearchBackend()
+        else:
+            _backend = BasicSearchBackend()
+    return _backend
+
+
+def search_posts(queryset, query):
+    """Filter ``queryset`` to posts matching ``query``, best match first."""
+    return get_search_backend().search(queryset, query)
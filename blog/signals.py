@@ -0,0 +1,247 @@
+# blog/signals.py
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal
+
+from . import counters
+from .generation import bump_generation
+from .models import Post, Category, Comment, Tag
+
+# Sent by blog.view_counter after buffered view counts were written.
+views_flushed = Signal()
+
+# Sent by blog.trending after Post.score was recomputed.
+scores_updated = Signal()
+
+# Sent by blog.related after the related-posts lists of post_ids changed.
+related_posts_updated = Signal()
+
+
+# Likes --------------------------------------------------------------------
+
+def post_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep ``Post.like_count`` current without recounting the M2M.
+
+    For ``add`` Django only reports rows it actually inserted, so the delta
+    is exact. For ``remove`` the ids are whatever the caller passed, so the
+    rows that really exist are counted before they are deleted.
+    """
+    if action == 'post_add':
+        if reverse:
+            Post.objects.filter(pk__in=pk_set).update(like_count=F('like_count') + 1)
+        else:
+            Post.objects.filter(pk=instance.pk).update(like_count=F('like_count') + len(pk_set))
+
+    elif action == 'pre_remove':
+        if reverse:
+            existing = sender.objects.filter(customuser_id=instance.pk, post_id__in=pk_set)
+            post_ids = list(existing.values_list('post_id', flat=True))
+            Post.objects.filter(pk__in=post_ids).update(like_count=F('like_count') - 1)
+        else:
+            removed = sender.objects.filter(post_id=instance.pk, customuser_id__in=pk_set).count()
+            if removed:
+                Post.objects.filter(pk=instance.pk).update(like_count=F('like_count') - removed)
+
+    elif action == 'pre_clear' and reverse:
+        instance._cleared_like_post_ids = list(
+            sender.objects.filter(customuser_id=instance.pk).values_list('post_id', flat=True)
+        )
+
+    elif action == 'post_clear':
+        if reverse:
+            counters.refresh_like_counts(getattr(instance, '_cleared_like_post_ids', []))
+        else:
+            Post.objects.filter(pk=instance.pk).update(like_count=0)
+
+
+def user_pre_delete(sender, instance, **kwargs):
+    instance._cleared_like_post_ids = list(instance.liked_posts.values_list('pk', flat=True))
+
+
+def user_post_delete(sender, instance, **kwargs):
+    # The through rows go away by cascade, which sends no m2m_changed.
+    counters.refresh_like_counts(getattr(instance, '_cleared_like_post_ids', []))
+
+
+# Comments -----------------------------------------------------------------
+
+def comment_changed(sender, instance, **kwargs):
+    counters.refresh_comment_counts([instance.post_id])
+
+
+# Published post counts ----------------------------------------------------
+
+COUNTED_POST_FIELDS = {'status', 'category', 'category_id', 'author', 'author_id'}
+
+
+def post_pre_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not COUNTED_POST_FIELDS.intersection(update_fields):
+        instance._counter_previous = None
+        instance._counter_skip = True
+        return
+    instance._counter_skip = False
+    previous = None
+    if instance.pk:
+        previous = Post.objects.filter(pk=instance.pk).values('status', 'category_id', 'author_id').first()
+    instance._counter_previous = previous
+
+
+def post_post_save(sender, instance, created, **kwargs):
+    if getattr(instance, '_counter_skip', False):
+        return
+    previous = getattr(instance, '_counter_previous', None)
+    if previous is None:
+        status_changed = instance.status == 'published'
+        category_ids = [instance.category_id]
+        author_ids = [instance.author_id]
+    else:
+        status_changed = previous['status'] != instance.status
+        category_changed = previous['category_id'] != instance.category_id
+        author_changed = previous['author_id'] != instance.author_id
+        if not (status_changed or category_changed or author_changed):
+            return
+        category_ids = [previous['category_id'], instance.category_id]
+        author_ids = [previous['author_id'], instance.author_id]
+
+    counters.refresh_category_counts(category_ids)
+    counters.refresh_author_counts(author_ids)
+    if status_changed and not created:
+        counters.refresh_tag_counts(list(instance.tags.values_list('pk', flat=True)))
+
+
+def post_pre_delete(sender, instance, **kwargs):
+    instance._counter_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+def post_post_delete(sender, instance, **kwargs):
+    counters.refresh_category_counts([instance.category_id])
+    counters.refresh_author_counts([instance.author_id])
+    counters.refresh_tag_counts(getattr(instance, '_counter_tag_ids', []))
+
+
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            counters.refresh_tag_counts([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._counter_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        counters.refresh_tag_counts(pk_set)
+    elif action == 'post_clear':
+        counters.refresh_tag_counts(getattr(instance, '_counter_tag_ids', []))
+
+
+# Content generation -------------------------------------------------------
+# Bumped when what listings show changes; see blog.generation.
+
+def post_content_changed(sender, instance, **kwargs):
+    # _counter_previous is stashed by post_pre_save; it is None when status
+    # wasn't part of update_fields, i.e. the status didn't change.
+    previous = getattr(instance, '_counter_previous', None)
+    if instance.status == 'published' or (previous and previous['status'] == 'published'):
+        bump_generation()
+
+
+def taxonomy_changed(sender, action=None, **kwargs):
+    if action is None or action.startswith('post_'):
+        bump_generation()
+
+
+# Trending activity ---------------------------------------------------------
+# Hourly buckets behind Post.score; likes are recorded by blog.likes.
+
+def record_view_activity(sender, counts, **kwargs):
+    from .trending import record_activity
+    record_activity(counts, 'views')
+
+
+def record_comment_activity(sender, instance, created, **kwargs):
+    if created:
+        from .trending import record_activity
+        record_activity({instance.post_id: 1}, 'comments')
+
+
+# Related posts -------------------------------------------------------------
+# Lists are recomputed in the background, see blog.related.
+
+RELATED_FIELDS = {'title', 'status', 'category', 'category_id'}
+
+
+def post_related_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not RELATED_FIELDS.intersection(update_fields):
+        return
+    previous = getattr(instance, '_counter_previous', None)
+    if instance.status == 'published' or (previous and previous['status'] == 'published'):
+        from .related import schedule_update
+        schedule_update(instance.pk)
+
+
+def post_related_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from .related import schedule_update
+    if not reverse:
+        if instance.status == 'published':
+            schedule_update(instance.pk)
+    elif pk_set:
+        for post_id in Post.objects.filter(pk__in=pk_set, status='published').values_list('pk', flat=True):
+            schedule_update(post_id)
+
+
+# Search index -------------------------------------------------------------
+
+# Only published posts are indexed, so status changes add or drop the row
+SEARCH_FIELDS = {'title', 'excerpt', 'content_type', 'content_html', 'content_markdown', 'status'}
+
+
+def post_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    from .search import get_search_backend
+    get_search_backend().index_posts([instance.pk])
+
+
+def post_unindex(sender, instance, **kwargs):
+    from .search import get_search_backend
+    get_search_backend().remove_posts([instance.pk])
+
+
+def connect_search_signals():
+    post_save.connect(post_index, sender=Post, dispatch_uid='blog_search_index')
+    post_delete.connect(post_unindex, sender=Post, dispatch_uid='blog_search_unindex')
+
+
+def connect_activity_signals():
+    views_flushed.connect(record_view_activity, dispatch_uid='blog_activity_views')
+    post_save.connect(record_comment_activity, sender=Comment, dispatch_uid='blog_activity_comment')
+
+
+def connect_related_signals():
+    post_save.connect(post_related_changed, sender=Post, dispatch_uid='blog_related_post_save')
+    m2m_changed.connect(post_related_tags_changed, sender=Post.tags.through, dispatch_uid='blog_related_post_tags')
+
+
+def connect_generation_signals():
+    post_save.connect(post_content_changed, sender=Post, dispatch_uid='blog_generation_post_save')
+    post_delete.connect(post_content_changed, sender=Post, dispatch_uid='blog_generation_post_delete')
+    m2m_changed.connect(taxonomy_changed, sender=Post.tags.through, dispatch_uid='blog_generation_post_tags')
+    for model in (Category, Tag):
+        post_save.connect(taxonomy_changed, sender=model, dispatch_uid=f'blog_generation_{model.__name__}_save')
+        post_delete.connect(taxonomy_changed, sender=model, dispatch_uid=f'blog_generation_{model.__name__}_delete')
+
+
+def connect_counter_signals():
+    m2m_changed.connect(post_likes_changed, sender=Post.likes.through, dispatch_uid='blog_counters_likes')
+    pre_delete.connect(user_pre_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='blog_counters_user_pre_delete')
+    post_delete.connect(user_post_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='blog_counters_user_delete')
+    post_save.connect(comment_changed, sender=Comment, dispatch_uid='blog_counters_comment_save')
+    post_delete.connect(comment_changed, sender=Comment, dispatch_uid='blog_counters_comment_delete')
+    pre_save.connect(post_pre_save, sender=Post, dispatch_uid='blog_counters_post_pre_save')
+    post_save.connect(post_post_save, sender=Post, dispatch_uid='blog_counters_post_save')
+    pre_delete.connect(post_pre_delete, sender=Post, dispatch_uid='blog_counters_post_pre_delete')
+    post_delete.connect(post_post_delete, sender=Post, dispatch_uid='blog_counters_post_delete')
+    m2m_changed.connect(post_tags_changed, sender=Post.tags.through, dispatch_uid='blog_counters_tags')
@@ -0,0 +1,173 @@
+# blog/sitemaps.py
+"""
+Streaming XML sitemaps.
+
+``/sitemap.xml`` is a sitemap index pointing at one file per section and
+page: ``/sitemap-posts-0.xml``, ``/sitemap-categories-0.xml`` and so on.
+Pages are primary-key ranges of ``SITEMAP_URLS_PER_FILE`` rows rather
+than offsets, so a page's URLs don't shift as posts are added. The index
+lists only non-empty ranges and is built from one grouped query per
+section.
+
+Section files are generated as the response streams: rows are read with
+``values_list(...).iterator(chunk_size=...)``, so memory stays flat no
+matter how many posts there are. The same generators back
+``manage.py generate_feeds``, which exports the files, e.g. for a CDN.
+
+Every response carries an ``ETag`` derived from the content generation
+(``blog.generation``), see ``core.conditional``.
+"""
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, Exists, F, IntegerField, Max, OuterRef, Value
+from django.db.models.functions import Cast
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+
+from core.conditional import conditional_page
+
+from .generation import get_generation
+from .models import Category, Post, Tag
+
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+CHUNK_SIZE = 2000
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# Public pages without a model behind them
+STATIC_PAGES = (
+    'core:home', 'blog:post_list', 'blog:category_list', 'core:about', 'core:contact',
+    'core:faq', 'core:privacy_policy', 'core:cookie_policy', 'core:terms',
+)
+
+
+def urls_per_file():
+    return getattr(settings, 'SITEMAP_URLS_PER_FILE', 10000)
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+class Section:
+    """A kind of page in the sitemap: a queryset and how to build its URLs."""
+
+    def __init__(self, queryset, columns, location, lastmod=None):
+        self.get_queryset = queryset
+        self.columns = columns
+        self.location = location
+        self.lastmod = lastmod
+
+    def pages(self):
+        """``[(page, lastmod or None), ...]`` for every non-empty page."""
+        size = urls_per_file()
+        page = Cast(F('pk') / Value(size), IntegerField())
+        rows = (
+            self.get_queryset().order_by().annotate(page=page).values('page')
+            .annotate(lastmod=Max(self.lastmod) if self.lastmod else Count('pk'))
+            .order_by('page').values_list('page', 'lastmod')
+        )
+        return [(number, lastmod if self.lastmod else None) for number, lastmod in rows]
+
+    def entries(self, page):
+        """``(location, lastmod or None)`` for every URL of ``page``, streamed."""
+        size = urls_per_file()
+        columns = [*self.columns, *([self.lastmod] if self.lastmod else [])]
+        rows = (
+            self.get_queryset().filter(pk__gte=page * size, pk__lt=(page + 1) * size)
+            .order_by('pk').values_list(*columns)
+        )
+        for row in rows.iterator(chunk_size=CHUNK_SIZE):
+            if self.lastmod:
+                *values, lastmod = row
+            else:
+                values, lastmod = row, None
+            yield self.location(*values), lastmod
+
+
+class StaticSection:
+    """The pages in ``STATIC_PAGES``, always a single page."""
+
+    def pages(self):
+        return [(0, None)]
+
+    def entries(self, page):
+        if page == 0:
+            for name in STATIC_PAGES:
+                yield reverse(name), None
+
+
+def _authors():
+    from users.models import CustomUser
+    return CustomUser.objects.filter(
+        Exists(Post.objects.filter(author=OuterRef('pk'), status='published'))
+    )
+
+
+SECTIONS = {
+    'pages': StaticSection(),
+    'posts': Section(
+        lambda: Post.objects.filter(status='published'), ['slug'],
+        lambda slug: reverse('blog:post_detail', kwargs={'slug': slug}), lastmod='updated_at',
+    ),
+    'categories': Section(
+        lambda: Category.objects.filter(published_post_count__gt=0), ['slug'],
+        lambda slug: reverse('blog:category_posts', kwargs={'slug': slug}),
+    ),
+    'tags': Section(
+        lambda: Tag.objects.filter(published_post_count__gt=0), ['slug'],
+        lambda slug: reverse('blog:tag_posts', kwargs={'slug': slug}),
+    ),
+    'authors': Section(
+        _authors, ['username'],
+        lambda username: reverse('blog:author_posts', kwargs={'username': username}),
+    ),
+}
+
+
+def _lastmod(value):
+    return f'<lastmod>{value.isoformat(timespec="seconds")}</lastmod>' if value else ''
+
+
+def generate_index():
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n'
+    for name, section in SECTIONS.items():
+        for page, lastmod in section.pages():
+            location = absolute(reverse('feeds:sitemap_section', kwargs={'section': name, 'page': page}))
+            yield f'<sitemap><loc>{escape(location)}</loc>{_lastmod(lastmod)}</sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def generate_section(name, page):
+    section = SECTIONS[name]
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n'
+    for location, lastmod in section.entries(page):
+        yield f'<url><loc>{escape(absolute(location))}</loc>{_lastmod(lastmod)}</url>\n'
+    yield '</urlset>\n'
+
+
+def documents():
+    """``(url path, content type, chunks)`` for every sitemap file."""
+    yield reverse('feeds:sitemap_index'), CONTENT_TYPE, generate_index()
+    for name, section in SECTIONS.items():
+        for page, _ in section.pages():
+            path = reverse('feeds:sitemap_section', kwargs={'section': name, 'page': page})
+            yield path, CONTENT_TYPE, generate_section(name, page)
+
+
+# Views ----------------------------------------------------------------------
+
+def sitemap_validators(request, section=None, page=None):
+    return {'etag': get_generation()}
+
+
+@conditional_page(sitemap_validators)
+def sitemap_index(request):
+    return StreamingHttpResponse(generate_index(), content_type=CONTENT_TYPE)
+
+
+@conditional_page(sitemap_validators)
+def sitemap_section(request, section, page):
+    if section not in SECTIONS:
+        raise Http404('No such sitemap section.')
+    return StreamingHttpResponse(generate_section(section, page), content_type=CONTENT_TYPE)
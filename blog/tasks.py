@@ -0,0 +1,26 @@
+# blog/tasks.py
+from core.jobs import task
+
+from . import newsletter, related, trending
+
+
+@task('blog.send_newsletter_issue', max_attempts=10, concurrency=1)
+def send_newsletter_issue(issue_id):
+    newsletter.dispatch_issue(issue_id)
+
+
+@task('blog.compute_trending_scores', max_attempts=3, concurrency=1)
+def compute_trending_scores():
+    # Reschedule first, so a failing run doesn't end the cycle
+    trending.schedule()
+    trending.compute_scores()
+
+
+@task('blog.update_related_posts', max_attempts=3, concurrency=1)
+def update_related_posts(post_id):
+    related.update_post(post_id)
+
+
+@task('blog.rebuild_related_posts', max_attempts=3, concurrency=1)
+def rebuild_related_posts():
+    related.rebuild_all()
@@ -6,5 +6,5 @@ register = template.Library()
 @register.simple_tag
 def total_category_posts():
     from ..models import Category
-    total = Category.objects.aggregate(total=Sum('num_posts'))['total']
+    total = Category.objects.aggregate(total=Sum('published_post_count'))['total']
     return total or 0
\ No newline at end of file
@@ -0,0 +1,59 @@
+# blog/templatetags/blog_widgets.py
+"""
+Sidebar widgets rendered once and cached as HTML fragments.
+
+They look the same for every visitor, so the queries and the rendering
+run only on a cache miss. Keys include the content generation
+(``blog.generation``), so publishing, unpublishing or retagging a post
+swaps in fresh fragments right away. ``BLOG_WIDGET_TIMEOUT`` only bounds
+how stale the "Trending" order and view counts can get.
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.instrumentation import note_cache
+
+from ..generation import get_generation
+
+register = template.Library()
+
+WIDGET_KEY = 'blog:widget:%s:%s'
+
+
+def cached_widget(name, template_name, build_context):
+    key = WIDGET_KEY % (name, get_generation())
+    html = cache.get(key)
+    note_cache(html is not None)
+    if html is None:
+        html = render_to_string(template_name, build_context())
+        cache.set(key, html, getattr(settings, 'BLOG_WIDGET_TIMEOUT', 300))
+    return mark_safe(html)
+
+
+@register.simple_tag
+def popular_posts_widget(limit=5):
+    from ..models import Post
+    return cached_widget(f'popular_posts:{limit}', 'blog/widgets/popular_posts.html', lambda: {
+        'popular_posts': Post.objects.trending()
+        .only('title', 'slug', 'featured_image', 'featured_image_variants', 'views')[:limit],
+    })
+
+
+@register.simple_tag
+def categories_widget():
+    from ..models import Category
+    return cached_widget('categories', 'blog/widgets/categories.html', lambda: {
+        'categories': Category.objects.annotate(num_posts=F('published_post_count')),
+    })
+
+
+@register.simple_tag
+def popular_tags_widget(limit=10):
+    from ..models import Tag
+    return cached_widget(f'popular_tags:{limit}', 'blog/widgets/popular_tags.html', lambda: {
+        'tags': Tag.objects.annotate(num_posts=F('published_post_count')).order_by('-num_posts')[:limit],
+    })
@@ -1,9 +1,10 @@
 from django import template
 from django.utils.safestring import mark_safe
-import markdown as md
+
+from ..rendering import render_markdown
 
 register = template.Library()
 
 @register.filter(name='markdown')
 def markdown_format(text):
-    return mark_safe(md.markdown(text, extensions=['fenced_code', 'codehilite']))
\ No newline at end of file
+    return mark_safe(render_markdown(text))
\ No newline at end of file
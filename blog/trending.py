@@ -0,0 +1,132 @@
+# blog/trending.py
+"""
+Time-decayed popularity scores for "Trending" and "Popular" lists.
+
+Views, likes and comments are counted into hourly ``PostActivity``
+buckets as they happen: view counts when ``blog.view_counter`` flushes,
+likes from ``blog.likes.set_like`` and comments from a signal. Each
+write is one multi-row ``INSERT ... ON CONFLICT DO UPDATE`` that adds to
+the bucket.
+
+``compute_scores`` runs on a schedule (the ``blog.compute_trending_scores``
+job, see ``blog.tasks``) and folds the buckets into ``Post.score``::
+
+    score = sum(weighted activity * 0.5 ** (age in hours / half-life))
+
+Buckets older than the horizon are dropped. Listings never sort by raw
+counters. They read ``Post.objects.trending()``, an index range scan over
+``(status, -score, -id)``.
+
+Tuning::
+
+    TRENDING_HALF_LIFE_HOURS = 48
+    TRENDING_HORIZON_DAYS = 30
+    TRENDING_WEIGHTS = {'views': 1, 'likes': 5, 'comments': 10}
+    TRENDING_INTERVAL = 15 * 60      # seconds between recomputations
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from .models import Post, PostActivity
+from .signals import scores_updated
+
+TASK_NAME = 'blog.compute_trending_scores'
+ACTIVITY_FIELDS = ('views', 'likes', 'comments')
+DEFAULT_WEIGHTS = {'views': 1, 'likes': 5, 'comments': 10}
+BATCH_SIZE = 500
+
+TABLE = PostActivity._meta.db_table
+POST_COLUMN = PostActivity._meta.get_field('post').column
+
+
+def bucket_hour(moment=None):
+    return (moment or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(counts, field='views', moment=None):
+    """Add ``{post_id: n}`` to the ``field`` column of the current hour's buckets."""
+    if field not in ACTIVITY_FIELDS:
+        raise ValueError(f'Unknown activity field {field!r}')
+    counts = [(post_id, n) for post_id, n in counts.items() if n]
+    if not counts:
+        return
+    hour = connection.ops.adapt_datetimefield_value(bucket_hour(moment))
+    columns = ', '.join((POST_COLUMN, 'hour', *ACTIVITY_FIELDS))
+    with connection.cursor() as cursor:
+        for start in range(0, len(counts), BATCH_SIZE):
+            batch = counts[start:start + BATCH_SIZE]
+            rows = []
+            params = []
+            for post_id, n in batch:
+                rows.append('(%s, %s, %s, %s, %s)')
+                params += [post_id, hour, *(n if name == field else 0 for name in ACTIVITY_FIELDS)]
+            cursor.execute(
+                f'INSERT INTO {TABLE} ({columns}) VALUES {", ".join(rows)} '
+                f'ON CONFLICT ({POST_COLUMN}, hour) DO UPDATE '
+                f'SET {field} = {TABLE}.{field} + excluded.{field}',
+                params,
+            )
+
+
+def half_life():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 48)
+
+
+def horizon():
+    return timedelta(days=getattr(settings, 'TRENDING_HORIZON_DAYS', 30))
+
+
+def weights():
+    return {**DEFAULT_WEIGHTS, **getattr(settings, 'TRENDING_WEIGHTS', {})}
+
+
+def interval():
+    return timedelta(seconds=getattr(settings, 'TRENDING_INTERVAL', 15 * 60))
+
+
+def compute_scores(now=None):
+    """Recompute ``Post.score`` from the buckets; returns the number of scored posts."""
+    now = now or timezone.now()
+    cutoff = bucket_hour(now) - horizon()
+    weight = weights()
+    hours = half_life()
+
+    scores = defaultdict(float)
+    buckets = PostActivity.objects.filter(hour__gte=cutoff).values_list('post_id', 'hour', *ACTIVITY_FIELDS)
+    for post_id, hour, views, likes, comments in buckets.iterator(chunk_size=2000):
+        activity = views * weight['views'] + likes * weight['likes'] + comments * weight['comments']
+        age = (now - hour).total_seconds() / 3600
+        scores[post_id] += activity * 0.5 ** (max(age, 0) / hours)
+
+    # Posts without recent activity sink back to zero
+    Post.objects.exclude(score=0).exclude(
+        pk__in=PostActivity.objects.filter(hour__gte=cutoff).values('post_id')
+    ).update(score=0)
+
+    items = [(post_id, round(max(score, 0), 6)) for post_id, score in scores.items()]
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = items[start:start + BATCH_SIZE]
+        Post.objects.filter(pk__in=[post_id for post_id, _ in batch]).update(score=Case(
+            *[When(pk=post_id, then=Value(score)) for post_id, score in batch],
+            default=F('score'),
+            output_field=FloatField(),
+        ))
+
+    PostActivity.objects.filter(hour__lt=cutoff).delete()
+    scores_updated.send(sender=None, post_ids=list(scores))
+    return len(items)
+
+
+def schedule():
+    """Queue the next recomputation unless one is already waiting."""
+    from core.jobs import enqueue
+    from core.models import Job
+
+    if Job.objects.filter(name=TASK_NAME, status=Job.QUEUED).exists():
+        return None
+    return enqueue(TASK_NAME, delay=interval())
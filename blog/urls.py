@@ -1,20 +1,25 @@
 # blog/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'blog'
 
+# Hot read paths and the like endpoints have async twins for ASGI deployments
+hot = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     # HOMEPAGE — Beautiful modern page with hero, featured, latest posts
-    path('', views.post_list, name='home'),
+    path('', hot.post_list, name='home'),
     
     # FULL BLOG LIST — Optional separate page (e.g. /blog/)
-    path('blog/', views.post_list, name='post_list'),
+    path('blog/', hot.post_list, name='post_list'),
 
     # Post detail & actions
-    path('post/<slug:slug>/', views.post_detail, name='post_detail'),
-    path('post/<slug:slug>/like/', views.post_like, name='post_like'),
+    path('post/<slug:slug>/', hot.post_detail, name='post_detail'),
+    path('post/<slug:slug>/like/', hot.post_like, name='post_like'),
     path('post/<slug:slug>/comment/', views.add_comment, name='add_comment'),
+    path('likes/', hot.liked_posts, name='liked_posts'),
 
     # Categories & Tags
     path('categories/', views.category_list, name='category_list'),
@@ -1,84 +1,144 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import F, Max
 from django.core.paginator import Paginator
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from .models import Post, Category, Tag, Comment, Newsletter
+from core.conditional import conditional_page
+from core.instrumentation import query_budget
+from core.ratelimit import ratelimit
+from core.pagecache import anonymous_page_cache, cached_dependencies, depends_on
+
+from . import likes, related, view_counter
+from .generation import get_generation, get_generations
+from .comments import load_comment_tree
+from .pagination import paginate_posts
+from .search import search_posts
 from datetime import datetime
 
+# Conditional GET probes (core.conditional): validators read before the
+# view runs, from the same generations the page cache depends on
+
+def listing_validators(request, *args, **kwargs):
+    return {'etag': get_generation()}
+
+
+def _object_validators(model, kind, **lookup):
+    pk = model.objects.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        return None
+    return {'etag': sorted(get_generations(['content', f'{kind}:{pk}']).items())}
+
+
+def category_validators(request, slug):
+    return _object_validators(Category, 'category', slug=slug)
+
+
+def tag_validators(request, slug):
+    return _object_validators(Tag, 'tag', slug=slug)
+
+
+def author_validators(request, username):
+    from users.models import CustomUser
+    return _object_validators(CustomUser, 'author', username=username)
+
+
+def post_validators(request, slug):
+    row = (
+        Post.objects.filter(slug=slug, status='published')
+        .annotate(last_comment=Max('comments__updated_at'))
+        .values_list('pk', 'updated_at', 'last_comment', 'like_count', 'comment_count', 'category_id', 'author_id')
+        .first()
+    )
+    if row is None:
+        return None
+    pk, updated_at, last_comment, like_count, comment_count, category_id, author_id = row
+    names = ['content', f'post:{pk}', f'author:{author_id}']
+    if category_id is not None:
+        names.append(f'category:{category_id}')
+    return {
+        'etag': [pk, like_count, comment_count, sorted(get_generations(names).items())],
+        'last_modified': max(filter(None, (updated_at, last_comment))),
+        'post': pk,
+    }
+
+
+def count_not_modified_view(request, result):
+    # A 304 skips the view, but the view still counts
+    view_counter.record(result['post'])
+
+
+@query_budget(10)
+@conditional_page(listing_validators)
 def post_list(request):
-    posts = Post.objects.filter(status='published').select_related('author', 'category').prefetch_related('tags')
+    posts = Post.objects.filter(status='published').cards()
     
-    # Search
+    # Search (ranked full-text, see blog.search)
     query = request.GET.get('q')
     if query:
-        posts = posts.filter(
-            Q(title__icontains=query) |
-            Q(excerpt__icontains=query) |
-            Q(content_html__icontains=query) |
-            Q(content_markdown__icontains=query)
-        )
+        posts = search_posts(posts, query)
     
     # Featured posts
     featured_posts = posts.filter(is_featured=True)[:3]
     
-    # Pagination
-    paginator = Paginator(posts, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Popular posts
-    popular_posts = Post.objects.filter(status='published').order_by('-views')[:5]
-    
-    # Categories with post count
-    categories = Category.objects.annotate(num_posts=Count('posts', filter=Q(posts__status='published')))
+    # Pagination: ranked search results by page number, everything else by cursor
+    if query:
+        page_obj = Paginator(posts, 9).get_page(request.GET.get('page'))
+    else:
+        page_obj = paginate_posts(request, posts)
     
-    # Popular tags
-    tags = Tag.objects.annotate(num_posts=Count('posts', filter=Q(posts__status='published'))).order_by('-num_posts')[:10]
+    # Popular posts, categories and tags are cached sidebar widgets
+    # (blog.templatetags.blog_widgets), rendered from the template
     
     context = {
         'posts': page_obj,
         'featured_posts': featured_posts,
-        'popular_posts': popular_posts,
-        'categories': categories,
-        'tags': tags,
         'query': query,
     }
     return render(request, 'blog/post_list.html', context)
 
+def count_cached_view(request, entry):
+    # Page cache hits skip the view, but the view still counts
+    for kind, pk in cached_dependencies(entry):
+        if kind == 'post':
+            view_counter.record(int(pk))
+
+@query_budget(10)
+@conditional_page(post_validators, on_not_modified=count_not_modified_view)
+@anonymous_page_cache(on_hit=count_cached_view)
 def post_detail(request, slug):
     post = get_object_or_404(Post.objects.select_related('author', 'category').prefetch_related('tags'), slug=slug, status='published')
+    depends_on(request, post=post.pk, category=post.category_id, author=post.author_id)
     
-    # Increment views
+    # Increment views (buffered, written back in batches by view_counter)
+    view_counter.record(post.pk)
     post.views += 1
-    post.save(update_fields=['views'])
     
-    # Comments
-    comments = post.comments.filter(is_approved=True, parent=None).select_related('author')
+    # Comments: the whole approved thread in one query, paginated by top-level thread
+    comment_tree = load_comment_tree(post)
+    comments = comment_tree.page(request.GET.get('comments'))
     
-    # Related posts
-    related_posts = Post.objects.filter(
-        status='published',
-        category=post.category
-    ).exclude(id=post.id)[:3]
+    # Related posts, precomputed by blog.related
+    related_posts = related.related_posts(post)
     
     # Check if user liked
-    user_liked = False
-    if request.user.is_authenticated:
-        user_liked = post.likes.filter(id=request.user.id).exists()
+    user_liked = post.pk in likes.liked_post_ids(request.user, [post.pk])
     
     context = {
         'post': post,
         'comments': comments,
+        'comment_count': comment_tree.count,
         'related_posts': related_posts,
         'user_liked': user_liked,
     }
     return render(request, 'blog/post_detail.html', context)
 
+@query_budget(3)
 def category_list(request):
     categories = Category.objects.annotate(
-        num_posts=Count('posts', filter=Q(posts__status='published'))
+        num_posts=F('published_post_count')
     ).order_by('-num_posts')
     
     context = {
@@ -86,13 +146,15 @@ def category_list(request):
     }
     return render(request, 'blog/category_list.html', context)
 
+@query_budget(6)
+@conditional_page(category_validators)
+@anonymous_page_cache()
 def category_posts(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    posts = Post.objects.filter(status='published', category=category).select_related('author')
+    depends_on(request, category=category.pk)
+    posts = Post.objects.filter(status='published', category=category).cards()
     
-    paginator = Paginator(posts, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_posts(request, posts)
     
     context = {
         'category': category,
@@ -100,13 +162,15 @@ def category_posts(request, slug):
     }
     return render(request, 'blog/category_posts.html', context)
 
+@query_budget(6)
+@conditional_page(tag_validators)
+@anonymous_page_cache()
 def tag_posts(request, slug):
     tag = get_object_or_404(Tag, slug=slug)
-    posts = Post.objects.filter(status='published', tags=tag).select_related('author', 'category')
+    depends_on(request, tag=tag.pk)
+    posts = Post.objects.filter(status='published', tags=tag).cards()
     
-    paginator = Paginator(posts, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_posts(request, posts)
     
     context = {
         'tag': tag,
@@ -114,37 +178,53 @@ def tag_posts(request, slug):
     }
     return render(request, 'blog/tag_posts.html', context)
 
+# A toggle that finds nothing to delete inserts, one more statement
+@query_budget(9)
 @login_required
 @require_POST
+@ratelimit('like', user='60/m', ip='120/m', endpoint='3000/m')
 def post_like(request, slug):
-    post = get_object_or_404(Post, slug=slug)
+    post_id = get_object_or_404(Post.objects.values_list('pk', flat=True), slug=slug)
     
-    if post.likes.filter(id=request.user.id).exists():
-        post.likes.remove(request.user)
-        liked = False
-    else:
-        post.likes.add(request.user)
-        liked = True
+    # Optional explicit action makes retries and double-clicks idempotent
+    action = request.POST.get('action')
+    if action not in likes.ACTIONS:
+        action = None
+    liked, like_count = likes.set_like(post_id, request.user.id, action)
     
     return JsonResponse({
         'liked': liked,
-        'like_count': post.like_count()
+        'like_count': like_count
     })
 
+@query_budget(3)
+@require_GET
+def liked_posts(request):
+    # "Liked by me" for a page of posts: ?ids=1,2,3
+    try:
+        post_ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk][:100]
+    except ValueError:
+        return JsonResponse({'liked': []}, status=400)
+    return JsonResponse({'liked': sorted(likes.liked_post_ids(request.user, post_ids))})
+
+@query_budget(8)
 @login_required
 @require_POST
+@ratelimit('comment', user='5/m', ip='20/m', endpoint='600/m')
 def add_comment(request, slug):
     post = get_object_or_404(Post, slug=slug)
     content = request.POST.get('content')
     parent_id = request.POST.get('parent_id')
     
     if content:
-        comment = Comment.objects.create(
-            post=post,
-            author=request.user,
-            content=content,
-            parent_id=parent_id if parent_id else None
-        )
+        # The comment and Post.comment_count (blog.signals) commit together
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                post=post,
+                author=request.user,
+                content=content,
+                parent_id=parent_id if parent_id else None
+            )
         return JsonResponse({
             'success': True,
             'comment': {
@@ -156,7 +236,9 @@ def add_comment(request, slug):
     
     return JsonResponse({'success': False}, status=400)
 
+@query_budget(4)
 @require_POST
+@ratelimit('newsletter', ip='10/h', endpoint='300/m')
 def newsletter_subscribe(request):
     email = request.POST.get('email')
     
@@ -174,17 +256,20 @@ def newsletter_subscribe(request):
     
     return JsonResponse({'success': False, 'message': 'Invalid email!'}, status=400)
 
+@query_budget(6)
+@conditional_page(author_validators)
+@anonymous_page_cache()
 def author_posts(request, username):
     from users.models import CustomUser
     author = get_object_or_404(CustomUser, username=username)
-    posts = Post.objects.filter(status='published', author=author).select_related('category')
+    depends_on(request, author=author.pk)
+    posts = Post.objects.filter(status='published', author=author).cards()
     
-    paginator = Paginator(posts, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_posts(request, posts)
     
     context = {
         'author': author,
         'posts': page_obj,
+        'post_count': author.published_post_count,
     }
     return render(request, 'blog/author_posts.html', context)
\ No newline at end of file
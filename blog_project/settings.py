@@ -76,14 +76,16 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Right after SecurityMiddleware, so static files skip everything below
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
 ROOT_URLCONF = 'blog_project.urls'
@@ -111,14 +113,35 @@ WSGI_APPLICATION = 'blog_project.wsgi.application'
 
 import dj_database_url
 
+# Persistent connections under ASGI: the async views run queries from a
+# pool of threads (core.asyncdb), and reconnecting for every one of them
+# would cost a handshake per query
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 600 if os.environ.get('ASYNC_VIEWS') == '1' else 0))
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        conn_max_age=CONN_MAX_AGE,
+        conn_health_checks=CONN_MAX_AGE > 0,
     )
 }
 
 
 
+# Cache
+# Snapshots, counters and fragment caches live here. The default is a
+# per-process LocMemCache; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. Redis or Memcached) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -157,6 +180,12 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Sitemaps and feeds are served by the streaming views (blog.sitemaps,
+# blog.feeds). `manage.py generate_feeds` exports them here, e.g. for a CDN
+PREGENERATED_ROOT = Path(os.environ.get('PREGENERATED_ROOT', BASE_DIR / 'public'))
+SITEMAP_URLS_PER_FILE = int(os.environ.get('SITEMAP_URLS_PER_FILE', 10000))
+FEED_ITEMS = int(os.environ.get('FEED_ITEMS', 50))
+
 
 
 # Default primary key field type
@@ -204,7 +233,135 @@ LOGOUT_REDIRECT_URL = 'core:home'
 
 
 
-# Tell Django to use Cloudinary for media files
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# Media files go to Cloudinary when it is configured and to MEDIA_ROOT
+# otherwise (development and tests). Django 5.1 dropped
+# DEFAULT_FILE_STORAGE, so the backend is chosen through STORAGES.
 MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+STORAGES = {
+    'default': {
+        'BACKEND': (
+            'cloudinary_storage.storage.MediaCloudinaryStorage' if os.environ.get('CLOUDINARY_URL')
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
+# Responsive image derivatives (core.images), generated by the worker.
+# Widths per 'app.Model.field'; formats the local Pillow can't encode are skipped
+IMAGE_DERIVATIVE_WIDTHS = {
+    'blog.Post.featured_image': (320, 640, 960, 1280, 1920),
+    'users.CustomUser.avatar': (48, 96, 192),
+}
+IMAGE_DERIVATIVE_FORMATS = ('avif', 'webp', 'jpeg')
+
+
+
+# Post view counting: hits are buffered and flushed as batched F() updates
+VIEW_COUNT_BUFFER = os.environ.get('VIEW_COUNT_BUFFER', 'blog.view_counter.MemoryBuffer')
+VIEW_COUNT_FLUSH_INTERVAL = int(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', 30))
+
+# Trending scores (blog.trending): hourly activity buckets folded into a
+# decayed Post.score by the blog.compute_trending_scores job
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 48))
+TRENDING_HORIZON_DAYS = int(os.environ.get('TRENDING_HORIZON_DAYS', 30))
+TRENDING_WEIGHTS = {'views': 1, 'likes': 5, 'comments': 10}
+TRENDING_INTERVAL = int(os.environ.get('TRENDING_INTERVAL', 15 * 60))
+
+# Related posts (blog.related): stored list length, and the postings length
+# above which a tag, category or title term stops proposing candidates
+RELATED_POSTS_LIMIT = int(os.environ.get('RELATED_POSTS_LIMIT', 6))
+RELATED_POSTS_MAX_POSTINGS = int(os.environ.get('RELATED_POSTS_MAX_POSTINGS', 500))
+# Seconds the worker keeps its corpus before loading it again
+RELATED_CORPUS_MAX_AGE = int(os.environ.get('RELATED_CORPUS_MAX_AGE', 3600))
+
+# Homepage snapshot (core.snapshot), invalidated by signals; TTL is a backstop
+HOME_SNAPSHOT_TIMEOUT = int(os.environ.get('HOME_SNAPSHOT_TIMEOUT', 600))
+
+# Cached sidebar widgets (blog.templatetags.blog_widgets) are keyed by the
+# content generation; the TTL only bounds how stale view counts get
+BLOG_WIDGET_TIMEOUT = int(os.environ.get('BLOG_WIDGET_TIMEOUT', 300))
+
+# Whether every process sees the same cache. The page cache and conditional
+# GETs need it (see core.checks), so they default to off with locmem
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Anonymous full-page cache (core.pagecache); purged precisely by signals,
+# the TTL bounds how stale like and view counts get
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE', '1' if SHARED_CACHE else '0') == '1'
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 600))
+
+# ETag/Last-Modified and 304s for anonymous page views (core.conditional);
+# validators also roll over every PAGE_CACHE_TIMEOUT seconds
+CONDITIONAL_GET_ENABLED = os.environ.get('CONDITIONAL_GET', '1' if SHARED_CACHE else '0') == '1'
+
+# About, FAQ and policy pages served to anonymous readers from files
+# written by `manage.py prerender_pages` (core.prerender)
+PRERENDER_ENABLED = os.environ.get('PRERENDER', '1') == '1'
+PRERENDER_ROOT = Path(os.environ.get('PRERENDER_ROOT', BASE_DIR / 'prerendered'))
+PRERENDER_MAX_AGE = int(os.environ.get('PRERENDER_MAX_AGE', 600))
+
+# Rate limits for write endpoints (core.ratelimit). RATELIMITS overrides a
+# view's defaults, e.g. {'comment': {'ip': '5/m'}}; set RATELIMIT_PROXY_COUNT
+# to the number of proxies appending to X-Forwarded-For (1 on Heroku).
+# Counters need a shared cache too, so they default to off with locmem
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT', '1' if SHARED_CACHE else '0') == '1'
+RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'core.ratelimit.CacheBackend')
+RATELIMIT_CACHE = 'default'
+RATELIMIT_PROXY_COUNT = int(os.environ.get('RATELIMIT_PROXY_COUNT', 0))
+RATELIMITS = {}
+
+# Request instrumentation (core.instrumentation): Server-Timing header,
+# per-view query budgets, and a log line per request, a warning for those
+# slower than INSTRUMENTATION_SLOW_MS (INSTRUMENTATION_LOG_LEVEL=DEBUG logs all)
+INSTRUMENTATION_SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+INSTRUMENTATION_SLOW_MS = int(os.environ.get('INSTRUMENTATION_SLOW_MS', 500))
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT') == '1'
+
+# Route the hot read views to their async versions (blog.async_views,
+# core.async_views). Only worth it under ASGI, see Procfile.asgi
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# Outgoing email. Sending happens in background jobs, never in requests
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') == '1'
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 30))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'EchoTales <no-reply@echotales.local>')
+CONTACT_EMAIL = os.environ.get('CONTACT_EMAIL', DEFAULT_FROM_EMAIL)
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000')
+SITE_NAME = os.environ.get('SITE_NAME', 'EchoTales')
+
+# Background jobs (core.jobs, run by manage.py run_worker)
+JOB_RETRY_BACKOFF = int(os.environ.get('JOB_RETRY_BACKOFF', 30))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 15 * 60))
+NEWSLETTER_BATCH_SIZE = int(os.environ.get('NEWSLETTER_BATCH_SIZE', 200))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('INSTRUMENTATION_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        'core.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -7,6 +7,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('blog/', include('blog.urls')),
+    path('api/v1/', include('blog.api_urls')),
+    path('', include('blog.feed_urls')),
     path('tinymce/', include('tinymce.urls')),
     path('markdownx/', include('markdownx.urls')),
 
@@ -1,3 +1,23 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'last_error']
+    readonly_fields = [f.name for f in Job._meta.fields]
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'{updated} job(s) requeued.')
+    retry_jobs.short_description = "Retry failed jobs"
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import checks  # registers the system checks
+        from .signals import connect_image_signals, connect_page_cache_signals, connect_snapshot_signals
+        connect_snapshot_signals()
+        connect_page_cache_signals()
+        connect_image_signals()
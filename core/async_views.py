@@ -0,0 +1,22 @@
+# core/async_views.py
+"""
+Async homepage, routed by ``core.urls`` when ``ASYNC_VIEWS`` is on.
+
+On a snapshot miss the homepage queries run concurrently (see
+``core.snapshot.abuild_home_snapshot``).
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+from .conditional import conditional_page
+from .instrumentation import query_budget
+from .snapshot import aget_home_snapshot
+from .views import HOME_SEO, home_validators
+
+
+@query_budget(10)
+@conditional_page(home_validators)
+async def home(request):
+    context = dict(await aget_home_snapshot())
+    context.update(HOME_SEO)
+    return await sync_to_async(render)(request, 'core/home.html', context)
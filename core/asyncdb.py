@@ -0,0 +1,36 @@
+# core/asyncdb.py
+"""
+Run independent ORM work concurrently from async views.
+
+Django's async ORM methods (``aget``, ``acount``, ``async for``) hand every
+query to one thread per request, so ``asyncio.gather`` over them still runs
+one query at a time. ``gather_queries`` runs each callable in the shared
+thread pool with ``thread_sensitive=False``. Each pool thread has its own
+database connection, so the queries really do overlap. That pays off when
+the database is remote and latency, not CPU, dominates.
+
+Pool threads keep their connections between calls. Before each call a
+connection past ``CONN_MAX_AGE`` or broken is replaced; nothing is closed
+after it, so with persistent connections (the default under
+``ASYNC_VIEWS``) a call costs no connection setup. That means up to one
+connection per pool thread and process. Callables must fully evaluate
+their querysets (``list(...)``, ``.count()``, ...) before returning.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _in_pool_thread(func):
+    def run():
+        # Request signals only look after the event loop thread's connection
+        close_old_connections()
+        return func()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def gather_queries(**callables):
+    """Run ``name=callable`` pairs concurrently and return ``{name: result}``."""
+    results = await asyncio.gather(*(_in_pool_thread(func)() for func in callables.values()))
+    return dict(zip(callables, results))
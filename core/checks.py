@@ -0,0 +1,53 @@
+# core/checks.py
+from django.conf import settings
+from django.core.checks import Error, register
+from django.utils.module_loading import import_string
+
+from blog.generation import is_shared
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The page cache and conditional GETs trust generation counters that are
+    bumped by whichever process changed the content. With a per-process
+    cache the other workers never see the bump and keep serving old pages.
+    """
+    if is_shared():
+        return []
+    errors = []
+    for setting, name in (('PAGE_CACHE_ENABLED', 'page cache'), ('CONDITIONAL_GET_ENABLED', 'conditional GET')):
+        if getattr(settings, setting, False):
+            errors.append(Error(
+                f'The {name} needs a cache shared by all processes; the default cache is per-process.',
+                hint=(
+                    f'Set CACHE_BACKEND/CACHE_LOCATION to Redis or Memcached, or turn off {setting}. '
+                    'A single-process server may silence this check.'
+                ),
+                id='core.E001' if setting == 'PAGE_CACHE_ENABLED' else 'core.E002',
+            ))
+    return errors
+
+
+@register()
+def check_ratelimit_cache(app_configs, **kwargs):
+    """
+    Rate-limit counters in a per-process cache are kept once per worker,
+    so every limit is really the limit times the number of workers.
+    """
+    from .ratelimit import CacheBackend
+
+    if not getattr(settings, 'RATELIMIT_ENABLED', False):
+        return []
+    backend = import_string(getattr(settings, 'RATELIMIT_BACKEND', 'core.ratelimit.CacheBackend'))
+    alias = getattr(settings, 'RATELIMIT_CACHE', 'default')
+    if not issubclass(backend, CacheBackend) or is_shared(alias):
+        return []
+    return [Error(
+        f'Rate limits need a cache shared by all processes; the {alias!r} cache is per-process.',
+        hint=(
+            'Set CACHE_BACKEND/CACHE_LOCATION to Redis or Memcached, or turn off RATELIMIT_ENABLED. '
+            'A single-process server may silence this check.'
+        ),
+        id='core.E003',
+    )]
@@ -0,0 +1,154 @@
+# core/conditional.py
+"""
+Conditional GET for public pages.
+
+``@conditional_page(probe)`` runs a cheap ``probe`` before the view and
+turns its result into a strong ``ETag`` (and ``Last-Modified`` when the
+probe knows a timestamp). A client or CDN that sends a matching
+``If-None-Match`` / ``If-Modified-Since`` gets a ``304`` straight away:
+the view's queries, the page cache and template rendering are all
+skipped.
+
+Probes read what the page cache's dependencies read (``blog.generation``
+counters, or one narrow row for a post), so a validator changes whenever
+the cached page would have been purged. Counters such as likes and views
+move without a purge; to keep them from going stale forever, validators
+also roll over every ``PAGE_CACHE_TIMEOUT`` seconds, the same bound the
+page cache gives them.
+
+Only anonymous requests (no session cookie) are handled, like the page
+cache. Logged-in pages carry per-user state that no probe covers.
+
+Over a view with ``@anonymous_page_cache()``, requests without
+``If-None-Match`` or ``If-Modified-Since`` aren't probed up front: the
+page cache runs the probe before rendering a miss and keeps the
+validators with the page, so a hit still costs no queries.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .instrumentation import note_cache
+from .pagecache import _cacheable_request
+
+
+def _applies(request):
+    return (
+        getattr(settings, 'CONDITIONAL_GET_ENABLED', True)
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def _conditional(request):
+    return 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+
+
+def _defers(view_func, request):
+    """Whether the page cache under the view takes the probe over, see ``_defer``."""
+    return (
+        getattr(view_func, 'page_cached', False)
+        and _cacheable_request(request)
+        and not _conditional(request)
+    )
+
+
+def _window():
+    return int(time.time() // max(getattr(settings, 'PAGE_CACHE_TIMEOUT', 600), 1))
+
+
+def _validators(request, result):
+    payload = json.dumps(
+        [request.get_full_path(), _window(), result['etag']],
+        cls=DjangoJSONEncoder, separators=(',', ':'), sort_keys=True,
+    )
+    etag = '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+    last_modified = result.get('last_modified')
+    return etag, (int(last_modified.timestamp()) if last_modified else None)
+
+
+def _not_modified(request, result, on_not_modified):
+    etag, last_modified = _validators(request, result)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        note_cache(True)
+        if on_not_modified is not None:
+            on_not_modified(request, result)
+    return response, etag, last_modified
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code == 200 and not response.has_header('ETag'):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _defer(request, probe, args, kwargs):
+    """
+    Leave the probe to ``core.pagecache``: on a miss it calls
+    ``request._page_validators()`` before rendering and the function it
+    returns on the response before storing it.
+    """
+    def validators():
+        result = probe(request, *args, **kwargs)
+        if result is None:
+            return None
+        etag, last_modified = _validators(request, result)
+        return lambda response: _finish(response, etag, last_modified)
+    request._page_validators = validators
+
+
+def conditional_page(probe, on_not_modified=None):
+    """
+    Answer conditional GETs for a view from ``probe``.
+
+    ``probe(request, *args, **kwargs)`` returns a dict with an ``etag``
+    entry (any JSON-serialisable value identifying the page's content) and
+    optionally ``last_modified`` (an aware datetime), or None when it can't
+    tell, e.g. for a missing object; the view then runs as usual.
+    ``on_not_modified(request, result)`` runs for every 304, for side
+    effects the view would otherwise have had.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _applies(request):
+                    return await view_func(request, *args, **kwargs)
+                if _defers(view_func, request):
+                    _defer(request, probe, args, kwargs)
+                    return await view_func(request, *args, **kwargs)
+                result = await sync_to_async(probe)(request, *args, **kwargs)
+                if result is None:
+                    return await view_func(request, *args, **kwargs)
+                response, etag, last_modified = await sync_to_async(_not_modified)(request, result, on_not_modified)
+                if response is not None:
+                    return response
+                return _finish(await view_func(request, *args, **kwargs), etag, last_modified)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _applies(request):
+                return view_func(request, *args, **kwargs)
+            if _defers(view_func, request):
+                _defer(request, probe, args, kwargs)
+                return view_func(request, *args, **kwargs)
+            result = probe(request, *args, **kwargs)
+            if result is None:
+                return view_func(request, *args, **kwargs)
+            response, etag, last_modified = _not_modified(request, result, on_not_modified)
+            if response is not None:
+                return response
+            return _finish(view_func(request, *args, **kwargs), etag, last_modified)
+        return wrapper
+    return decorator
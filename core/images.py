@@ -0,0 +1,198 @@
+# core/images.py
+"""
+Responsive image derivatives.
+
+Uploaded images such as ``Post.featured_image`` and ``CustomUser.avatar``
+were served at their original size everywhere, 40px avatars included.
+For every image field listed in ``IMAGE_DERIVATIVE_WIDTHS``, this module
+renders resized copies at fixed widths, in each format Pillow can encode
+here (AVIF, WebP and always JPEG). The copies are written to the field's
+storage next to a ``derivatives/`` prefix and recorded in a
+``<field>_variants`` JSON column on the same model::
+
+    {
+        "source": "posts/cover.png",
+        "width": 1280, "height": 720,
+        "variants": {"webp": {"320": "derivatives/posts/cover-3f2a9c1e-320w.webp", ...}, ...}
+    }
+
+Saving a model whose image changed queues a ``core.generate_image_derivatives``
+job, so the work happens in ``run_worker`` and never on the request thread.
+Until the job has run, templates fall back to the original file.
+``core.templatetags.images`` turns the manifest into ``srcset`` attributes
+and ``<picture>`` elements.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger('core.images')
+
+TASK_NAME = 'core.generate_image_derivatives'
+
+# Sent after new derivatives were recorded: sender is the model class.
+derivatives_ready = Signal()
+
+DEFAULT_WIDTHS = {
+    'blog.Post.featured_image': (320, 640, 960, 1280, 1920),
+    'users.CustomUser.avatar': (48, 96, 192),
+}
+
+# Preferred first; unsupported encoders are skipped, JPEG always works
+FORMATS = {
+    'avif': {'mime': 'image/avif', 'pil': 'AVIF', 'options': {'quality': 55}},
+    'webp': {'mime': 'image/webp', 'pil': 'WEBP', 'options': {'quality': 80}},
+    'jpeg': {'mime': 'image/jpeg', 'pil': 'JPEG', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+
+def derivative_widths():
+    return {**DEFAULT_WIDTHS, **getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', {})}
+
+
+def derivative_formats():
+    wanted = getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', tuple(FORMATS))
+    supported = [fmt for fmt in wanted if fmt in FORMATS and (fmt == 'jpeg' or features.check(fmt))]
+    return supported if 'jpeg' in supported else [*supported, 'jpeg']
+
+
+def manifest_field(field_name):
+    return f'{field_name}_variants'
+
+
+def registered_fields(model):
+    """Names of ``model``'s image fields that get derivatives."""
+    label = model._meta.label
+    return [path.rsplit('.', 1)[1] for path in derivative_widths() if path.rsplit('.', 1)[0] == label]
+
+
+def get_manifest(instance, field_name):
+    """The recorded manifest, or None if it doesn't match the current image."""
+    file = getattr(instance, field_name)
+    manifest = getattr(instance, manifest_field(field_name), None) or {}
+    if not file or manifest.get('source') != file.name:
+        return None
+    return manifest
+
+
+def _derivative_name(source, width, fmt):
+    stem = posixpath.splitext(source)[0]
+    digest = hashlib.sha256(source.encode()).hexdigest()[:8]
+    return f'derivatives/{stem}-{digest}-{width}w.{"jpg" if fmt == "jpeg" else fmt}'
+
+
+def _prepare(image, fmt):
+    if fmt == 'jpeg':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    return image
+
+
+def render_derivatives(file, widths, formats=None):
+    """
+    Resize the image in ``file`` and store every width and format.
+
+    Widths above the original's are dropped; the original width takes
+    their place, so small uploads are never upscaled. Derivatives that
+    already exist in the storage are reused. Returns the manifest.
+    """
+    formats = formats or derivative_formats()
+    storage = file.storage
+    with file.open('rb') as handle:
+        image = Image.open(handle)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    original_width, original_height = image.size
+    targets = sorted({min(width, original_width) for width in widths})
+    manifest = {
+        'source': file.name,
+        'width': targets[-1],
+        'height': round(original_height * targets[-1] / original_width),
+        'variants': {fmt: {} for fmt in formats},
+    }
+    for width in targets:
+        height = max(1, round(original_height * width / original_width))
+        resized = image if width == original_width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            name = _derivative_name(file.name, width, fmt)
+            if not storage.exists(name):
+                buffer = io.BytesIO()
+                _prepare(resized, fmt).save(buffer, FORMATS[fmt]['pil'], **FORMATS[fmt]['options'])
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            manifest['variants'][fmt][str(width)] = name
+    return manifest
+
+
+def generate(model_label, pk, field_name):
+    """Job body: build derivatives for one object's image and record them."""
+    model = apps.get_model(model_label)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return None
+    file = getattr(instance, field_name)
+    if not file:
+        return None
+    if get_manifest(instance, field_name) is not None:
+        return None
+
+    widths = derivative_widths()[f'{model._meta.label}.{field_name}']
+    manifest = render_derivatives(file, widths)
+    previous = getattr(instance, manifest_field(field_name)) or {}
+    # Only record it if the image wasn't replaced while we were resizing
+    updated = model._default_manager.filter(pk=pk, **{field_name: file.name}).update(
+        **{manifest_field(field_name): manifest}
+    )
+    if not updated:
+        return None
+    _delete_stale(file.storage, previous, manifest)
+    derivatives_ready.send(sender=model, pk=pk, field_name=field_name)
+    return manifest
+
+
+def _delete_stale(storage, previous, current):
+    keep = {name for sizes in current['variants'].values() for name in sizes.values()}
+    for sizes in (previous.get('variants') or {}).values():
+        for name in sizes.values():
+            if name not in keep:
+                try:
+                    storage.delete(name)
+                except Exception:
+                    logger.warning('could not delete stale derivative %s', name, exc_info=True)
+
+
+def schedule(instance, field_name):
+    """Queue derivative generation for ``instance``, unless already queued."""
+    from .jobs import enqueue
+    from .models import Job
+
+    payload = {'model': instance._meta.label, 'pk': instance.pk, 'field_name': field_name}
+    if Job.objects.filter(name=TASK_NAME, status=Job.QUEUED, payload=payload).exists():
+        return None
+    return enqueue(TASK_NAME, payload)
+
+
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    """post_save handler: queue new derivatives or drop a stale manifest."""
+    for field_name in registered_fields(sender):
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        file = getattr(instance, field_name)
+        manifest = getattr(instance, manifest_field(field_name)) or {}
+        if file and manifest.get('source') != file.name:
+            schedule(instance, field_name)
+        elif not file and manifest:
+            sender._default_manager.filter(pk=instance.pk).update(**{manifest_field(field_name): {}})
@@ -0,0 +1,243 @@
+# core/instrumentation.py
+"""
+Per-request query and latency instrumentation.
+
+Every database connection gets an execute wrapper when it is created
+(``connection_created``). The wrapper reports to the metrics of the current
+request, which live in a context variable, so queries are counted in
+whichever thread runs them: the request thread, the threads that async views
+hand ORM calls to, or the pool used by ``core.asyncdb``.
+``InstrumentationMiddleware`` records, for each request:
+
+* number of queries and total SQL time,
+* duplicate queries (identical SQL and parameters run more than once),
+* template render time,
+* cache hits/misses reported by our caching layers via ``note_cache()``.
+
+The numbers are sent as a ``Server-Timing`` header and logged as one
+structured line on the ``core.instrumentation`` logger: at ``WARNING`` for
+requests slower than ``INSTRUMENTATION_SLOW_MS``, at ``DEBUG`` otherwise,
+so production logs only carry the requests worth a look.
+
+Views declare how many queries they may run with ``@query_budget(n)`` (or
+a ``query_budget`` attribute on class-based views). Going over budget logs
+a warning, and raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT``
+is on, which is how tests catch N+1 regressions (see ``core.testing``).
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger('core.instrumentation')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_template_timer_installed = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.template_time = 0.0
+        self.in_template = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.lock = threading.Lock()
+
+    def record_query(self, sql, params, duration):
+        # Async views may run queries for one request in several threads
+        with self.lock:
+            self.sql_time += duration
+            self.queries += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def most_duplicated(self):
+        if not self.duplicates:
+            return None
+        (sql, _), n = self.statements.most_common(1)[0]
+        return sql, n
+
+
+def current_metrics():
+    return _current.get()
+
+
+def note_cache(hit):
+    """Record a cache hit or miss for the current request, if any."""
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def query_budget(limit):
+    """Declare the maximum number of queries a view may run per request."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, params, time.perf_counter() - start)
+
+
+def _install_execute_wrapper(sender, connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def _wrap_open_connections():
+    # Connections opened before the middleware was loaded never sent
+    # connection_created to us
+    for connection in connections.all(initialized_only=True):
+        _install_execute_wrapper(None, connection)
+
+
+def _view_budget(view_func):
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view_func, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+def _install_template_timer():
+    """Time only the outermost Template.render of each request."""
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    original_render = Template.render
+
+    @wraps(original_render)
+    def timed_render(self, context):
+        metrics = _current.get()
+        if metrics is None or metrics.in_template:
+            return original_render(self, context)
+        metrics.in_template = True
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.in_template = False
+
+    Template.render = timed_render
+    _template_timer_installed = True
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True)
+        self.slow_ms = getattr(settings, 'INSTRUMENTATION_SLOW_MS', 500)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _install_template_timer()
+        connection_created.connect(_install_execute_wrapper, dispatch_uid='core_instrumentation')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _wrap_open_connections()
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, total):
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries, {metrics.duplicates} dup"',
+                f'tpl;dur={metrics.template_time * 1000:.1f}',
+                f'cache;desc="{metrics.cache_hits} hit, {metrics.cache_misses} miss"',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        view_name = getattr(request, '_instrumented_view', '')
+        level = logging.WARNING if total * 1000 >= self.slow_ms else logging.DEBUG
+        logger.log(
+            level,
+            'view=%s path=%s status=%s queries=%d dup=%d sql_ms=%.1f tpl_ms=%.1f '
+            'cache_hit=%d cache_miss=%d total_ms=%.1f',
+            view_name, request.path, response.status_code, metrics.queries, metrics.duplicates,
+            metrics.sql_time * 1000, metrics.template_time * 1000,
+            metrics.cache_hits, metrics.cache_misses, total * 1000,
+            extra={
+                'view': view_name,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                'duplicate_queries': metrics.duplicates,
+                'sql_ms': round(metrics.sql_time * 1000, 1),
+                'template_ms': round(metrics.template_time * 1000, 1),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                'total_ms': round(total * 1000, 1),
+            },
+        )
+        duplicated = metrics.most_duplicated()
+        if duplicated:
+            logger.warning('view=%s ran %d duplicate queries, e.g. %dx: %s',
+                           view_name, metrics.duplicates, duplicated[1], duplicated[0])
+
+        self._check_budget(request, metrics, view_name)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        request._instrumented_view = f'{view.__module__}.{view.__qualname__}'
+        request._query_budget = _view_budget(view_func)
+        return None
+
+    def _check_budget(self, request, metrics, view_name):
+        budget = getattr(request, '_query_budget', None)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = f'{view_name} ran {metrics.queries} queries, budget is {budget} ({request.path})'
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
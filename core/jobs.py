@@ -0,0 +1,212 @@
+# core/jobs.py
+"""
+Database-backed background jobs.
+
+Register a task with ``@task('name')``, in a ``tasks`` module of any
+installed app, and queue it with ``enqueue('name', {'key': value})``.
+``manage.py run_worker`` picks jobs up, runs them outside the request
+cycle and records the outcome on the ``Job`` row.
+
+* Claiming is optimistic: a worker flips ``queued`` to ``running`` with a
+  conditional UPDATE and only runs the job if it won. This works the same
+  on PostgreSQL and SQLite, so any number of workers can share the table.
+* Failed jobs are retried with exponential backoff until ``max_attempts``.
+* ``concurrency`` caps how many jobs of one task run at once across all
+  workers, e.g. one newsletter send at a time. A running job holds one of
+  the task's ``concurrency`` slots; the claim UPDATE takes the slot and a
+  unique index on running ``(name, slot)`` refuses a claim beyond the cap,
+  however many workers race for it.
+* Jobs left ``running`` by a crashed worker are requeued once their lock
+  is older than ``JOB_LOCK_TIMEOUT``. Long tasks call ``heartbeat()`` as
+  they make progress to keep their lock fresh; it raises ``LockLost`` if
+  the job was requeued meanwhile, and the outcome of a job that lost its
+  lock is not recorded over the new run's.
+
+``enqueue`` writes in the caller's transaction, so a job only becomes
+visible if the surrounding work commits.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger('core.jobs')
+
+_registry = {}
+
+# The job this thread is running, for heartbeat()
+_current = threading.local()
+
+
+class LockLost(Exception):
+    """The running job was requeued (its lock went stale) and belongs to someone else now."""
+
+
+class Task:
+    def __init__(self, func, name, max_attempts, concurrency):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+    def enqueue(self, delay=None, **payload):
+        return enqueue(self.name, payload, delay=delay)
+
+
+def task(name, max_attempts=5, concurrency=None):
+    """Register a function as a background task."""
+    def decorator(func):
+        _registry[name] = Task(func, name, max_attempts, concurrency)
+        return _registry[name]
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('tasks')
+
+
+def get_task(name):
+    if name not in _registry:
+        autodiscover()
+    return _registry[name]
+
+
+def enqueue(name, payload=None, delay=None):
+    """Queue task ``name`` to run with the ``payload`` dict as keyword arguments."""
+    run_after = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=get_task(name).max_attempts,
+        run_after=run_after,
+    )
+
+
+def backoff(attempts):
+    base = getattr(settings, 'JOB_RETRY_BACKOFF', 30)
+    delay = min(base * 2 ** (attempts - 1), 6 * 60 * 60)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale():
+    """Give jobs of crashed workers back to the queue."""
+    timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', 15 * 60)
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None, slot=None)
+
+
+def _free_slots(name):
+    """Slots the task has free, ``[None]`` if it is unlimited."""
+    limit = get_task(name).concurrency if name in _registry else None
+    if limit is None:
+        return [None]
+    taken = set(Job.objects.filter(name=name, status=Job.RUNNING).values_list('slot', flat=True))
+    return [slot for slot in range(limit) if slot not in taken]
+
+
+def claim(worker, names=None):
+    """Claim the next due job for ``worker``; returns it or None."""
+    candidates = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now())
+    if names:
+        candidates = candidates.filter(name__in=names)
+    for pk, name in candidates.order_by('run_after', 'pk').values_list('pk', 'name')[:20]:
+        if name not in _registry:
+            autodiscover()
+        for slot in _free_slots(name):
+            try:
+                with transaction.atomic():
+                    claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                        status=Job.RUNNING,
+                        slot=slot,
+                        locked_by=worker,
+                        locked_at=timezone.now(),
+                        attempts=F('attempts') + 1,
+                    )
+            except IntegrityError:
+                # Another worker took this slot first
+                continue
+            if claimed:
+                return Job.objects.get(pk=pk)
+            # Claimed by another worker
+            break
+    return None
+
+
+def heartbeat():
+    """
+    Refresh the lock of the job running in this thread, so a long task isn't
+    requeued as stale. Raises ``LockLost`` if it already was. A no-op
+    outside of a job.
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return
+    refreshed = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by).update(
+        locked_at=timezone.now(),
+    )
+    if not refreshed:
+        raise LockLost(f'{job} was requeued while running')
+
+
+def run(job):
+    """Run a claimed job and record success, a retry or the final failure."""
+    worker = job.locked_by
+    _current.job = job
+    try:
+        get_task(job.name)(**job.payload)
+    except LockLost:
+        logger.warning('job %s lost its lock while running; leaving it to its new run', job)
+        return job
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + backoff(job.attempts)
+            logger.warning('job %s failed (attempt %d/%d), retrying at %s',
+                           job, job.attempts, job.max_attempts, job.run_after)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error('job %s failed permanently:\n%s', job, job.last_error)
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    finally:
+        _current.job = None
+    job.locked_by = ''
+    job.locked_at = None
+    job.slot = None
+    # Only while this worker still holds the job; a requeued job belongs
+    # to its new run
+    recorded = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker).update(
+        status=job.status,
+        run_after=job.run_after,
+        last_error=job.last_error,
+        finished_at=job.finished_at,
+        locked_by='',
+        locked_at=None,
+        slot=None,
+    )
+    if not recorded:
+        logger.warning('job %s was requeued while running; its outcome is not recorded', job)
+    return job
@@ -0,0 +1,156 @@
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Category, Post, Tag
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the public views through the test client and report p50/p95 "
+        "latency, query count and peak memory, compared against a stored "
+        "baseline. Every view is measured warm (page cache, snapshot and "
+        "prerendered files in use) and cold (cache cleared before every "
+        "request, nothing prerendered). Run against a database seeded with "
+        "seed_benchmark_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write this run as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 slowdown before reporting a regression (0.2 = 20%%).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--warm-only', action='store_true', help='Skip the cold pass.')
+
+    def handle(self, *args, **options):
+        targets = self.targets()
+        if not targets:
+            raise CommandError('No published posts found. Run seed_benchmark_data first.')
+
+        client = Client()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, url in targets:
+                results[name] = self.measure(client, url, options['iterations'], options['warmup'])
+                results[name]['url'] = url
+            if not options['warm_only']:
+                with override_settings(PRERENDER_ENABLED=False):
+                    for name, url in targets:
+                        results[f'{name}:cold'] = self.measure(client, url, options['iterations'], 0, cold=True)
+                        results[f'{name}:cold']['url'] = url
+
+        baseline_path = Path(options['baseline'])
+        baseline = {}
+        if baseline_path.exists():
+            baseline = json.loads(baseline_path.read_text())
+
+        regressions = self.report(results, baseline, options['tolerance'])
+
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regression(s): {", ".join(regressions)}')
+
+    def targets(self):
+        post = (
+            Post.objects.filter(status='published')
+            .order_by('-comment_count', '-views')
+            .values('slug', 'title')
+            .first()
+        )
+        if post is None:
+            return []
+        category = Category.objects.order_by('-published_post_count').values_list('slug', flat=True).first()
+        tag = Tag.objects.order_by('-published_post_count').values_list('slug', flat=True).first()
+        author = (
+            get_user_model().objects.annotate(n=Count('posts')).order_by('-n')
+            .values_list('username', flat=True).first()
+        )
+        term = post['title'].split()[0]
+        return [
+            ('home', reverse('core:home')),
+            ('post_list', reverse('blog:post_list')),
+            ('post_list_search', f"{reverse('blog:post_list')}?q={term}"),
+            ('post_detail', reverse('blog:post_detail', args=[post['slug']])),
+            ('category_posts', reverse('blog:category_posts', args=[category])),
+            ('tag_posts', reverse('blog:tag_posts', args=[tag])),
+            ('author_posts', reverse('blog:author_posts', args=[author])),
+            ('about', reverse('core:about')),
+        ]
+
+    def measure(self, client, url, iterations, warmup, cold=False):
+        for _ in range(warmup):
+            client.get(url)
+
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+
+        # Memory is measured on a separate request: tracemalloc slows
+        # everything down and would skew the latency numbers.
+        if cold:
+            cache.clear()
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def report(self, results, baseline, tolerance):
+        header = f"{'view':<23}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>11}  vs baseline"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        regressions = []
+        for name, result in results.items():
+            line = (
+                f"{name:<23}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['queries']:>9}{result['peak_kib']:>11.1f}"
+            )
+            previous = baseline.get(name)
+            if previous:
+                change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0
+                note = f'  p95 {change:+.0%}, queries {result["queries"] - previous["queries"]:+d}'
+                if change > tolerance or result['queries'] > previous['queries']:
+                    regressions.append(name)
+                    line = self.style.ERROR(line + note + '  REGRESSION')
+                else:
+                    line += note
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,46 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.generation import is_shared
+from core import prerender
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the about, FAQ and policy pages to PRERENDER_ROOT (with .gz "
+        "copies), from where anonymous readers are served. Run it on each web "
+        "dyno before the server starts (see Procfile): PRERENDER_ROOT is "
+        "local to the machine, and template changes are picked up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*', help='URL names to render, e.g. core:faq (default: all).')
+
+    def handle(self, *args, **options):
+        if not settings.PRERENDER_ENABLED:
+            # Not an error: the web dyno runs this before starting the server
+            self.stdout.write('Prerendering is disabled (PRERENDER_ENABLED), nothing to do.')
+            return
+        # Registers the @prerendered views
+        import_module(settings.ROOT_URLCONF)
+        names = options['pages'] or sorted(prerender.PAGES)
+        unknown = set(names) - set(prerender.PAGES)
+        if unknown:
+            raise CommandError(f'Not prerendered pages: {", ".join(sorted(unknown))}')
+        started = time.monotonic()
+        for name in list(names):
+            if prerender.PAGES[name] and not is_shared():
+                self.stdout.write(f'  {name}: skipped, its dependencies need a shared cache')
+                names.remove(name)
+                continue
+            try:
+                path = prerender.prerender(name)
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f'  {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Prerendered {len(names)} page(s) to {settings.PRERENDER_ROOT} in {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (core.jobs) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue is empty instead of polling.')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Seconds to wait between polls when idle.')
+        parser.add_argument('--max-jobs', type=int, default=0,
+                            help='Exit after this many jobs (0 = no limit).')
+        parser.add_argument('--only', nargs='*', default=None, metavar='TASK',
+                            help='Only run these task names.')
+
+    def handle(self, *args, **options):
+        jobs.autodiscover()
+        worker = jobs.worker_name()
+        self.stdout.write(f'Worker {worker} started.')
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                jobs.requeue_stale()
+                job = jobs.claim(worker, options['only'])
+                if job is None:
+                    if options['burst']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                job = jobs.run(job)
+                processed += 1
+                self.stdout.write(f'{job} after {job.attempts} attempt(s)')
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Worker {worker} stopped after {processed} job(s).')
@@ -0,0 +1,233 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from blog import counters, related, trending
+from blog.models import Category, Comment, Newsletter, Post, Tag
+from blog.search import get_search_backend
+
+User = get_user_model()
+
+WORDS = (
+    'python django query index cache latency worker database postgres design '
+    'engineering leadership team product release migration async template '
+    'server client request response model view signal queue search ranking '
+    'feature scale traffic memory profile benchmark deploy review testing '
+    'ownership culture hiring roadmap growth platform data pipeline stream'
+).split()
+
+CATEGORY_NAMES = [
+    'Engineering', 'Leadership', 'Design', 'Product', 'Data', 'DevOps',
+    'Security', 'Career', 'Culture', 'Frontend', 'Backend', 'Mobile',
+    'AI', 'Cloud', 'Testing', 'Performance', 'Architecture', 'Open Source',
+    'Startups', 'Management',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset for benchmarking with bulk_create in batches. "
+        "Defaults match production scale; use --scale to shrink it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=5000)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=500_000)
+        parser.add_argument('--likes', type=int, default=1_000_000)
+        parser.add_argument('--subscribers', type=int, default=50_000)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiply every count, e.g. 0.01 for a quick local dataset.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        scale = options['scale']
+
+        def scaled(name, minimum=1):
+            return max(minimum, int(options[name] * scale))
+
+        self.prefix = f'bench{timezone.now():%Y%m%d%H%M%S}'
+        users = self.seed_users(scaled('users'))
+        categories = self.seed_categories(min(scaled('categories'), len(CATEGORY_NAMES)))
+        tags = self.seed_tags(scaled('tags'))
+        posts = self.seed_posts(scaled('posts'), users, categories, tags)
+        self.seed_comments(scaled('comments', 0), posts, users)
+        self.seed_likes(scaled('likes', 0), posts, users)
+        self.seed_subscribers(scaled('subscribers', 0))
+        self.seed_activity(posts)
+
+        # bulk_create skips Post.save and the signals; build what they would
+        # have, so the benchmark runs against a dataset like production's
+        self.stdout.write('Recounting denormalized counters...')
+        counters.recount_all()
+        self.stdout.write('Computing related posts...')
+        related.rebuild_all()
+        self.stdout.write('Computing trending scores...')
+        trending.compute_scores()
+        self.stdout.write('Rebuilding search index...')
+        with transaction.atomic():
+            get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS('Benchmark dataset ready.'))
+
+    # Helpers --------------------------------------------------------------
+
+    def sentence(self, low, high):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def body_markdown(self):
+        paragraphs = [self.sentence(40, 120).capitalize() + '.' for _ in range(self.rng.randint(3, 12))]
+        if self.rng.random() < 0.3:
+            paragraphs.append('```python\nfor item in items:\n    print(item)\n```')
+        return '\n\n'.join(paragraphs)
+
+    def body_html(self):
+        return ''.join(f'<p>{self.sentence(40, 120)}</p>' for _ in range(self.rng.randint(3, 12)))
+
+    def bulk(self, model, objects, **kwargs):
+        # Insert in batches without keeping created instances around.
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch, **kwargs)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, **kwargs)
+
+    def max_pk(self, model):
+        return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def ids_after(self, model, pk):
+        return list(model.objects.filter(pk__gt=pk).order_by('pk').values_list('pk', flat=True))
+
+    # Seeders --------------------------------------------------------------
+
+    def seed_users(self, count):
+        self.stdout.write(f'Creating {count} users...')
+        password = make_password(None)
+        start = self.max_pk(User)
+        self.bulk(User, (
+            User(
+                username=f'{self.prefix}_user{i}',
+                email=f'{self.prefix}_user{i}@example.com',
+                first_name=self.rng.choice(WORDS).title(),
+                last_name=self.rng.choice(WORDS).title(),
+                password=password,
+            )
+            for i in range(count)
+        ))
+        return self.ids_after(User, start)
+
+    def seed_categories(self, count):
+        self.stdout.write(f'Creating {count} categories...')
+        categories = []
+        for name in CATEGORY_NAMES[:count]:
+            category, _ = Category.objects.get_or_create(name=name, defaults={'slug': slugify(name)})
+            categories.append(category.pk)
+        return categories
+
+    def seed_tags(self, count):
+        self.stdout.write(f'Creating {count} tags...')
+        start = self.max_pk(Tag)
+        self.bulk(Tag, (
+            Tag(name=f'{self.rng.choice(WORDS)}-{self.prefix}-{i}', slug=f'{self.prefix}-tag-{i}')
+            for i in range(count)
+        ))
+        return self.ids_after(Tag, start)
+
+    def seed_posts(self, count, users, categories, tags):
+        self.stdout.write(f'Creating {count} posts...')
+        now = timezone.now()
+
+        def build(i):
+            published = self.rng.random() < 0.9
+            content_type = 'markdown' if self.rng.random() < 0.5 else 'html'
+            title = self.sentence(4, 10).title()
+            post = Post(
+                title=title,
+                slug=f'{slugify(title)[:150]}-{self.prefix}-{i}',
+                author_id=self.rng.choice(users),
+                category_id=self.rng.choice(categories),
+                excerpt=self.sentence(15, 40),
+                content_type=content_type,
+                content_markdown=self.body_markdown() if content_type == 'markdown' else '',
+                content_html=self.body_html() if content_type == 'html' else '',
+                status='published' if published else 'draft',
+                is_featured=self.rng.random() < 0.02,
+                views=int(self.rng.paretovariate(1.2) * 50),
+                published_at=now - timedelta(minutes=self.rng.randint(0, 3 * 365 * 24 * 60)) if published else None,
+            )
+            # What Post.save would have stored
+            post.render_content()
+            post.count_words()
+            return post
+
+        start = self.max_pk(Post)
+        self.bulk(Post, (build(i) for i in range(count)))
+        posts = self.ids_after(Post, start)
+
+        self.stdout.write('Tagging posts...')
+        Through = Post.tags.through
+        self.bulk(Through, (
+            Through(post_id=post_id, tag_id=tag_id)
+            for post_id in posts
+            for tag_id in self.rng.sample(tags, min(len(tags), self.rng.randint(1, 5)))
+        ), ignore_conflicts=True)
+        return posts
+
+    def seed_comments(self, count, posts, users):
+        self.stdout.write(f'Creating {count} comments...')
+        # Top-level comments first, then replies pointing at them.
+        top_level = count * 2 // 3
+        start = self.max_pk(Comment)
+        self.bulk(Comment, (
+            Comment(post_id=self.rng.choice(posts), author_id=self.rng.choice(users), content=self.sentence(5, 60))
+            for _ in range(top_level)
+        ))
+        parents = list(Comment.objects.filter(pk__gt=start).values_list('pk', 'post_id'))
+        if not parents:
+            return
+        self.bulk(Comment, (
+            Comment(post_id=post_id, parent_id=parent_id, author_id=self.rng.choice(users), content=self.sentence(5, 40))
+            for parent_id, post_id in (self.rng.choice(parents) for _ in range(count - top_level))
+        ))
+
+    def seed_likes(self, count, posts, users):
+        self.stdout.write(f'Creating up to {count} likes...')
+        Through = Post.likes.through
+        count = min(count, len(posts) * len(users))
+        self.bulk(Through, (
+            Through(post_id=self.rng.choice(posts), customuser_id=self.rng.choice(users))
+            for _ in range(count)
+        ), ignore_conflicts=True)
+
+    def seed_activity(self, posts, hours=72, share=0.01):
+        # Hourly buckets for the trending scores: a share of the posts gets
+        # views, likes and comments in each of the last few hours
+        self.stdout.write(f'Recording {hours} hours of activity...')
+        now = timezone.now()
+        size = max(1, int(len(posts) * share))
+        for hour in range(hours):
+            moment = now - timedelta(hours=hour)
+            sample = self.rng.sample(posts, min(size, len(posts)))
+            trending.record_activity({pk: int(self.rng.paretovariate(1.2) * 5) for pk in sample}, 'views', moment)
+            trending.record_activity({pk: self.rng.randint(0, 3) for pk in sample[::4]}, 'likes', moment)
+            trending.record_activity({pk: self.rng.randint(0, 2) for pk in sample[::8]}, 'comments', moment)
+
+    def seed_subscribers(self, count):
+        self.stdout.write(f'Creating {count} newsletter subscribers...')
+        self.bulk(Newsletter, (
+            Newsletter(email=f'{self.prefix}_reader{i}@example.com', is_active=self.rng.random() < 0.9)
+            for i in range(count)
+        ), ignore_conflicts=True)
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='slot',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('name', 'slot'), name='core_job_running_slot'),
+        ),
+    ]
@@ -0,0 +1,181 @@
+# core/pagecache.py
+"""
+Full-response cache for anonymous readers.
+
+``@anonymous_page_cache()`` stores whole GET responses keyed by host, path
+and query string. It only applies to requests without a session cookie,
+so it never touches the session or the database to find out who is
+asking. A response is stored only if it is a plain 200 that set no
+cookies and rendered no CSRF token.
+
+Views record what a page was built from with ``depends_on(request,
+post=..., category=..., tag=..., author=...)``. Each dependency is a
+generation counter (``blog.generation``). A cached entry keeps the
+generations it saw and is served only while all of them are unchanged.
+``purge()`` (called from ``core.signals`` when posts, comments,
+categories, tags or authors change) bumps the counters, so exactly the
+pages that used that object miss. Nothing has to keep a list of URLs.
+
+Under ``core.conditional.conditional_page``, a miss also runs the
+conditional GET probe before rendering and stores the page with its
+``ETag`` and ``Last-Modified``, which hits then send as they are.
+
+Like counts and view counts on cached pages may lag by up to
+``PAGE_CACHE_TIMEOUT``.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from blog.generation import bump_generation, get_generations
+
+from .instrumentation import note_cache
+
+PAGE_KEY = 'core:page:%s'
+SKIPPED_HEADERS = {'set-cookie', 'server-timing'}
+
+
+def _dependency_names(**dependencies):
+    names = set()
+    for kind, ids in dependencies.items():
+        if ids is None:
+            continue
+        if isinstance(ids, (int, str)):
+            ids = [ids]
+        names.update(f'{kind}:{pk}' for pk in ids if pk is not None)
+    return names
+
+
+def depends_on(request, **dependencies):
+    """
+    Record the objects the current page is built from.
+
+    Call it before querying them: generations are read here, so a purge
+    that lands while the page renders makes the stored entry stale rather
+    than hiding the change.
+    """
+    if not _cacheable_request(request):
+        return
+    if not hasattr(request, '_page_generations'):
+        request._page_generations = {}
+    names = _dependency_names(**dependencies) - request._page_generations.keys()
+    if names:
+        request._page_generations.update(get_generations(names))
+
+
+def purge(**dependencies):
+    """Invalidate every cached page that depends on any of the given objects."""
+    for name in _dependency_names(**dependencies):
+        bump_generation(name)
+
+
+def _cacheable_request(request):
+    return (
+        getattr(settings, 'PAGE_CACHE_ENABLED', True)
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def _cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _page_key(request):
+    url = request.build_absolute_uri()
+    return PAGE_KEY % hashlib.md5(url.encode()).hexdigest()
+
+
+def cached_dependencies(entry):
+    """``(kind, id)`` pairs recorded for a cached page, e.g. ``('post', '12')``."""
+    return [tuple(name.split(':', 1)) for name in entry['generations']]
+
+
+def _cached_response(request, key, on_hit):
+    entry = cache.get(key)
+    if entry is None or get_generations(entry['generations']) != entry['generations']:
+        note_cache(False)
+        return None
+    note_cache(True)
+    if on_hit is not None:
+        on_hit(request, entry)
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _validated(request):
+    """Probe for the page's validators before it renders, see ``core.conditional``."""
+    validators = getattr(request, '_page_validators', None)
+    return validators() if validators is not None else None
+
+
+def _render(request, key, response, finish):
+    if finish is not None:
+        response = finish(response)
+    return _store(request, key, response)
+
+
+def _store(request, key, response):
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    if _cacheable_response(request, response):
+        cache.set(key, {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': [(h, v) for h, v in response.items() if h.lower() not in SKIPPED_HEADERS],
+            'generations': getattr(request, '_page_generations', {}),
+        }, getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+        response['X-Page-Cache'] = 'miss'
+    return response
+
+
+def anonymous_page_cache(on_hit=None):
+    """
+    Serve anonymous GETs from the page cache.
+
+    ``on_hit(request, entry)`` runs for every cache hit, for side effects
+    the view would otherwise have had, such as counting a post view.
+    Works on sync and async views alike.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _cacheable_request(request):
+                    return await view_func(request, *args, **kwargs)
+                key = _page_key(request)
+                response = await sync_to_async(_cached_response)(request, key, on_hit)
+                if response is None:
+                    finish = await sync_to_async(_validated)(request)
+                    response = await view_func(request, *args, **kwargs)
+                    response = await sync_to_async(_render)(request, key, response, finish)
+                return response
+            async_wrapper.page_cached = True
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+            key = _page_key(request)
+            response = _cached_response(request, key, on_hit)
+            if response is None:
+                finish = _validated(request)
+                response = _render(request, key, view_func(request, *args, **kwargs), finish)
+            return response
+        wrapper.page_cached = True
+        return wrapper
+    return decorator
@@ -0,0 +1,221 @@
+# core/prerender.py
+"""
+Prerendered pages for anonymous readers.
+
+The about, FAQ and policy pages are the same for every anonymous reader.
+``@prerendered('core:faq')`` keeps each one as an HTML file with a gzip
+copy in ``PRERENDER_ROOT`` and answers anonymous GETs straight from it:
+no template rendering, no queries, a ``FileResponse`` with ``ETag``,
+``Last-Modified`` and ``Cache-Control``. Logged-in readers see their own
+navigation, so they always get the view; that is also why the files are
+not handed to WhiteNoise, which would serve them to everyone.
+
+A page can depend on generations (``blog.generation``), e.g. the about
+page on ``content``, plus whatever the view records with
+``core.pagecache.depends_on``. The file keeps the generations it was
+rendered against; once one moves, requests fall through to the view and
+the first of them writes the page again. That takes a cache shared by all
+processes (``blog.generation.is_shared``); without one, such pages are
+always rendered by the view. Pages without dependencies are
+rewritten by ``manage.py prerender_pages``, which also warms every page.
+``PRERENDER_ROOT`` is local to each machine (on Heroku, a release-phase
+dyno's files are thrown away), so the command runs on the web dyno ahead
+of the server, once per dyno rather than per worker (see Procfile). A page
+still missing is written by the first request that finds it.
+
+Each render is written as ``<page>.<hash>.html`` (and ``.html.gz``) and
+published by replacing ``<page>.json``, so readers never see a partial
+file.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import FileResponse
+from django.urls import resolve, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from blog.generation import get_generations, is_shared
+
+from .instrumentation import note_cache
+from .pagecache import _cacheable_response
+
+LOCK_KEY = 'core:prerender:lock:%s'
+LOCK_TIMEOUT = 60
+CONTENT_TYPE = 'text/html; charset=utf-8'
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+# URL name: generations the page depends on
+PAGES = {}
+
+# Parsed <page>.json files of this process, by path and mtime
+_manifests = {}
+
+
+def root():
+    return Path(settings.PRERENDER_ROOT)
+
+
+def _manifest_path(name):
+    return root() / f'{name.replace(":", "-")}.json'
+
+
+def _manifest(name):
+    path = _manifest_path(name)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _manifests.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            cached = _manifests[path] = (mtime, json.loads(path.read_bytes()))
+        except (FileNotFoundError, ValueError):
+            return None
+    return cached[1]
+
+
+def _applies(request, name):
+    return (
+        getattr(settings, 'PRERENDER_ENABLED', True)
+        # Other processes' counters would disagree and keep rewriting it
+        and (not PAGES[name] or is_shared())
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        # Pending flash messages would be rendered into the page
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def serve(request, name):
+    """The prerendered page as a response, or None if it is missing or stale."""
+    manifest = _manifest(name)
+    if manifest is None:
+        return None
+    generations = manifest['generations']
+    if generations and get_generations(generations) != generations:
+        return None
+    gzipped = bool(ACCEPTS_GZIP.search(request.headers.get('accept-encoding', '')))
+    etag = '"%s%s"' % (manifest['hash'], '-gz' if gzipped else '')
+    response = get_conditional_response(request, etag=etag, last_modified=manifest['rendered_at'])
+    if response is None:
+        try:
+            file = open(root() / (manifest['file'] + ('.gz' if gzipped else '')), 'rb')
+        except FileNotFoundError:
+            # Replaced by a newer render since the manifest was read
+            return None
+        response = FileResponse(file, content_type=CONTENT_TYPE)
+        del response['Content-Disposition']
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        response['Last-Modified'] = http_date(manifest['rendered_at'])
+    note_cache(True)
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'PRERENDER_MAX_AGE', 600))
+    response['X-Prerendered'] = 'hit'
+    return response
+
+
+def _atomic_write(path, data):
+    fd, temp = tempfile.mkstemp(prefix=f'.{path.name}-', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def write(name, content, generations):
+    """Publish ``content`` as the prerendered page ``name``."""
+    directory = root()
+    directory.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    stem = name.replace(':', '-')
+    file = f'{stem}.{digest}.html'
+    _atomic_write(directory / file, content)
+    _atomic_write(directory / f'{file}.gz', gzip.compress(content, mtime=0))
+    _atomic_write(_manifest_path(name), json.dumps({
+        'file': file,
+        'hash': digest,
+        'rendered_at': int(time.time()),
+        'generations': generations,
+    }).encode())
+    for old in directory.glob(f'{stem}.*.html*'):
+        if not old.name.startswith(file):
+            old.unlink(missing_ok=True)
+
+
+def _store(request, name, generations, response):
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    # A query string doesn't change these pages, but isn't worth trusting
+    if not _cacheable_response(request, response) or request.GET:
+        return response
+    forced = getattr(request, '_prerender', False)
+    # Only one of the requests that found the page stale writes it
+    if forced or cache.add(LOCK_KEY % name, 1, LOCK_TIMEOUT):
+        try:
+            generations = {**generations, **getattr(request, '_page_generations', {})}
+            write(name, response.content, generations)
+        finally:
+            if not forced:
+                cache.delete(LOCK_KEY % name)
+        response['X-Prerendered'] = 'miss'
+    return response
+
+
+def prerendered(name, dependencies=()):
+    """
+    Serve a page to anonymous readers from its prerendered file.
+
+    ``name`` is the page's URL name; ``dependencies`` are the generations
+    whose change makes the file stale.
+    """
+    PAGES[name] = tuple(dependencies)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _applies(request, name):
+                return view_func(request, *args, **kwargs)
+            if not getattr(request, '_prerender', False):
+                response = serve(request, name)
+                if response is not None:
+                    return response
+            # Read before rendering, so a change that lands meanwhile
+            # leaves the file stale rather than hiding the change
+            generations = get_generations(PAGES[name]) if PAGES[name] else {}
+            return _store(request, name, generations, view_func(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def prerender(name):
+    """Render page ``name`` as an anonymous request to ``SITE_URL`` would and write it."""
+    from django.test import RequestFactory
+
+    path = reverse(name)
+    site = urlsplit(settings.SITE_URL)
+    request = RequestFactory().get(path, HTTP_HOST=site.netloc, secure=site.scheme == 'https')
+    request.user = AnonymousUser()
+    request._prerender = True
+    response = resolve(path).func(request)
+    if response.get('X-Prerendered') != 'miss':
+        raise RuntimeError(f'{path} answered {response.status_code} and could not be prerendered.')
+    return path
@@ -0,0 +1,215 @@
+# core/ratelimit.py
+"""
+Rate limits for write endpoints.
+
+``@ratelimit('comment', user='10/m', ip='30/m', endpoint='600/m')`` lets a
+view through only while every listed limit has room, and otherwise
+answers ``429 Too Many Requests`` with a ``Retry-After`` header, before
+the view touches the database:
+
+* ``user`` counts per authenticated user (anonymous requests count per IP);
+* ``ip`` counts per client address, see ``client_ip``;
+* ``endpoint`` counts all requests to the view together, a ceiling on the
+  write load one endpoint can put on the database.
+
+Rates are ``'<n>/<period>'`` with ``s``, ``m``, ``h`` or ``d`` (or a number
+of seconds, ``'5/30'``). ``RATELIMITS = {'comment': {'ip': '5/m'}}`` in
+settings overrides a view's defaults; ``None`` disables a limit.
+
+Each limit behaves like a token bucket holding ``n`` tokens that refill
+evenly over the period. It is kept as two fixed-window counters, the
+current window's and the previous one's weighted by how much of it still
+overlaps the sliding period, because that only needs ``cache.incr``,
+which is atomic on Redis and Memcached, no read-modify-write. Every
+attempt is counted, so a client that keeps hammering stays limited.
+
+Counters live in the ``RATELIMIT_CACHE`` cache by default
+(``CacheBackend``), which must be shared by all processes (Redis,
+Memcached): in a per-process ``LocMemCache`` each worker keeps its own
+counts, multiplying every limit by the number of workers, so the
+``core`` system checks refuse it. ``MemoryBackend`` keeps them in a dict of this process,
+for tests: ``override_settings(RATELIMIT_BACKEND='core.ratelimit.MemoryBackend')``
+and ``reset()`` between tests.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+KEY = 'core:ratelimit:%s:%s:%s:%d'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+SCOPES = ('user', 'ip', 'endpoint')
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> ``(10, 60)``."""
+    try:
+        count, period = rate.split('/')
+        period = PERIODS[period] if period in PERIODS else int(period)
+        return int(count), period
+    except (KeyError, ValueError):
+        raise ImproperlyConfigured(f'Invalid rate {rate!r}; use e.g. "10/m" or "5/30".')
+
+
+class CacheBackend:
+    """
+    Counters in the Django cache. ``incr`` keeps them exact across processes
+    only if the cache itself is shared, see ``core.checks``.
+    """
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'RATELIMIT_CACHE', 'default')]
+
+    def incr(self, key, timeout):
+        # add() is a no-op if the key exists, so concurrent first hits
+        # still count each other
+        self.cache.add(key, 0, timeout)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.add(key, 1, timeout)
+            return 1
+
+    def get(self, key):
+        return self.cache.get(key, 0)
+
+
+class MemoryBackend:
+    """Counters in a dict of this process, for tests."""
+
+    _counters = {}
+    _lock = threading.Lock()
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            value, expires = self._counters.get(key, (0, now + timeout))
+            if expires <= now:
+                value, expires = 0, now + timeout
+            self._counters[key] = (value + 1, expires)
+            return value + 1
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._counters.get(key, (0, 0))
+            return value if expires > time.monotonic() else 0
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters.clear()
+
+
+_backends = {}
+
+
+def get_backend():
+    path = getattr(settings, 'RATELIMIT_BACKEND', 'core.ratelimit.CacheBackend')
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def reset():
+    """Forget all counters of the in-memory backend."""
+    MemoryBackend.reset()
+
+
+def hit(name, scope, identity, rate, now=None):
+    """
+    Count one request against a limit. Returns 0 if it is within the limit,
+    else the number of seconds until it would be.
+    """
+    limit, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    window = int(now // period)
+    elapsed = now - window * period
+    backend = get_backend()
+    current = backend.incr(KEY % (name, scope, identity, window), period * 2)
+    previous = backend.get(KEY % (name, scope, identity, window - 1))
+    weight = (period - elapsed) / period
+    if previous * weight + current <= limit:
+        return 0
+    if current > limit or not previous:
+        # Only the next window brings room
+        return max(1, math.ceil(period - elapsed))
+    # The previous window's share shrinks as time passes; room opens once
+    # previous * (period - elapsed - wait) / period + current <= limit
+    wait = (period - elapsed) - (limit - current) * period / previous
+    return max(1, math.ceil(wait))
+
+
+def client_ip(request):
+    """
+    The client's address. Behind ``RATELIMIT_PROXY_COUNT`` trusted proxies
+    that append to ``X-Forwarded-For``, it is that many entries from the end.
+    """
+    proxies = getattr(settings, 'RATELIMIT_PROXY_COUNT', 0)
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _limits(name, defaults):
+    limits = {**defaults, **getattr(settings, 'RATELIMITS', {}).get(name, {})}
+    unknown = set(limits) - set(SCOPES)
+    if unknown:
+        raise ImproperlyConfigured(f'Unknown rate limit scope(s) for {name!r}: {", ".join(sorted(unknown))}')
+    return {scope: rate for scope, rate in limits.items() if rate}
+
+
+def check(request, name, limits, user):
+    """Count the request against every limit; the longest wait, or 0."""
+    identities = {
+        'user': f'u{user.pk}' if user is not None and user.is_authenticated else f'ip{client_ip(request)}',
+        'ip': client_ip(request),
+        'endpoint': '*',
+    }
+    # Every limit counts the attempt, even once one has refused it
+    return max((hit(name, scope, identities[scope], rate) for scope, rate in limits.items()), default=0)
+
+
+def too_many_requests(request, retry_after):
+    # The limited endpoints are all JSON ones, called from fetch()
+    response = JsonResponse({'success': False, 'message': 'Too many requests. Please try again later.'}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(name, **defaults):
+    """
+    Limit a view to the given rates per scope (see the module docstring).
+    ``name`` keys the counters and the ``RATELIMITS`` setting. Works on sync
+    and async views alike.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if getattr(settings, 'RATELIMIT_ENABLED', True):
+                    user = await request.auser()
+                    retry_after = await sync_to_async(check)(request, name, _limits(name, defaults), user)
+                    if retry_after:
+                        return too_many_requests(request, retry_after)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if getattr(settings, 'RATELIMIT_ENABLED', True):
+                retry_after = check(request, name, _limits(name, defaults), getattr(request, 'user', None))
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
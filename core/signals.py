@@ -0,0 +1,116 @@
+# core/signals.py
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from blog.models import Post, Category, Tag, Newsletter, Comment
+from blog.generation import bump_generation
+from blog.signals import related_posts_updated, scores_updated, views_flushed
+
+from . import images
+from .pagecache import purge
+from .snapshot import invalidate_home_snapshot
+
+SNAPSHOT_MODELS = (Post, Category, Tag, Newsletter)
+
+
+def connect_snapshot_signals():
+    for model in SNAPSHOT_MODELS:
+        post_save.connect(invalidate_home_snapshot, sender=model, dispatch_uid=f'home_snapshot_save_{model.__name__}')
+        post_delete.connect(invalidate_home_snapshot, sender=model, dispatch_uid=f'home_snapshot_delete_{model.__name__}')
+    m2m_changed.connect(invalidate_home_snapshot, sender=Post.tags.through, dispatch_uid='home_snapshot_post_tags')
+    views_flushed.connect(invalidate_home_snapshot, dispatch_uid='home_snapshot_views_flushed')
+    scores_updated.connect(invalidate_home_snapshot, dispatch_uid='home_snapshot_scores_updated')
+
+
+
+# Page cache purges (core.pagecache) ---------------------------------------
+
+def _purge_post(instance, tag_ids):
+    # blog.signals stashes the pre-save status and category
+    previous = getattr(instance, '_counter_previous', None) or {}
+    if instance.status != 'published' and previous.get('status') != 'published':
+        return
+    purge(
+        post=instance.pk,
+        category=[instance.category_id, previous.get('category_id')],
+        author=instance.author_id,
+        tag=tag_ids,
+    )
+
+
+def purge_saved_post_pages(sender, instance, **kwargs):
+    _purge_post(instance, instance.tags.values_list('pk', flat=True))
+
+
+def purge_deleted_post_pages(sender, instance, **kwargs):
+    # Tags are gone by now; blog.signals.post_pre_delete stashed them
+    _purge_post(instance, getattr(instance, '_counter_tag_ids', []))
+
+
+def purge_post_tag_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.posts if reverse else instance.tags
+        instance._page_cache_cleared = list(related.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    related_ids = pk_set if action != 'post_clear' else getattr(instance, '_page_cache_cleared', [])
+    if reverse:
+        purge(tag=instance.pk, post=related_ids)
+    else:
+        purge(post=instance.pk, tag=related_ids)
+
+
+def purge_comment_pages(sender, instance, **kwargs):
+    purge(post=instance.post_id)
+
+
+def purge_category_pages(sender, instance, **kwargs):
+    purge(category=instance.pk)
+
+
+def purge_tag_pages(sender, instance, **kwargs):
+    purge(tag=instance.pk)
+
+
+def purge_author_pages(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no public page shows
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    purge(author=instance.pk)
+
+
+def purge_related_post_pages(sender, post_ids, **kwargs):
+    purge(post=post_ids)
+
+
+def purge_image_pages(sender, pk, **kwargs):
+    if sender is Post:
+        purge(post=pk)
+        # Listings and widgets show the image too
+        bump_generation()
+    elif sender is get_user_model():
+        purge(author=pk)
+
+
+def connect_page_cache_signals():
+    post_save.connect(purge_saved_post_pages, sender=Post, dispatch_uid='page_cache_post_save')
+    post_delete.connect(purge_deleted_post_pages, sender=Post, dispatch_uid='page_cache_post_delete')
+    m2m_changed.connect(purge_post_tag_pages, sender=Post.tags.through, dispatch_uid='page_cache_post_tags')
+    related_posts_updated.connect(purge_related_post_pages, dispatch_uid='page_cache_related_posts')
+    images.derivatives_ready.connect(purge_image_pages, dispatch_uid='page_cache_image_derivatives')
+    for signal, name in ((post_save, 'save'), (post_delete, 'delete')):
+        signal.connect(purge_comment_pages, sender=Comment, dispatch_uid=f'page_cache_comment_{name}')
+        signal.connect(purge_category_pages, sender=Category, dispatch_uid=f'page_cache_category_{name}')
+        signal.connect(purge_tag_pages, sender=Tag, dispatch_uid=f'page_cache_tag_{name}')
+        signal.connect(purge_author_pages, sender=settings.AUTH_USER_MODEL, dispatch_uid=f'page_cache_author_{name}')
+
+
+# Image derivatives (core.images) ---------------------------------------------
+
+def connect_image_signals():
+    for path in images.derivative_widths():
+        model = apps.get_model(path.rsplit('.', 1)[0])
+        post_save.connect(images.image_saved, sender=model, dispatch_uid=f'image_derivatives_{model._meta.label}')
@@ -0,0 +1,177 @@
+# core/snapshot.py
+"""
+Precomputed homepage context.
+
+``core.views.home`` used to run about ten queries per request even though
+everything it shows only changes when content is published or view
+counters are flushed. The context is now built once, stored in the cache
+and invalidated from model signals (see ``core.signals``).
+
+Rebuilds are stampede-protected: only the worker holding the rebuild lock
+queries the database, everyone else keeps serving the previous (stale)
+snapshot, or waits briefly for the builder when there is none at all.
+"""
+import asyncio
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .asyncdb import gather_queries
+from .instrumentation import note_cache
+
+SNAPSHOT_KEY = 'core:home:snapshot'
+STALE_KEY = 'core:home:snapshot:stale'
+LOCK_KEY = 'core:home:snapshot:lock'
+
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+
+
+def snapshot_timeout():
+    return getattr(settings, 'HOME_SNAPSHOT_TIMEOUT', 600)
+
+
+def _snapshot_queries():
+    """The independent homepage queries, as ``name: callable`` pairs."""
+    from blog.models import Post, Category, Tag, Newsletter
+
+    published = Post.objects.filter(status='published')
+    now = timezone.now()
+
+    return {
+        # 1. Featured Posts – 1 hero + up to 4 side cards (max 5)
+        'featured_posts': lambda: list(
+            published.filter(is_featured=True).cards()
+            .order_by('-published_at')[:5]
+        ),
+        # 2. Latest Posts – 8 for the "Latest Articles" grid
+        'posts': lambda: list(
+            published.cards()
+            .order_by('-published_at')[:8]
+        ),
+        # 3. Categories – with published post count
+        'categories': lambda: list(
+            Category.objects.annotate(num_posts=F('published_post_count'))
+            .filter(published_post_count__gt=0)
+            .order_by('-published_post_count', 'name')[:12]
+        ),
+        # 4. Popular Tags – top 24 by usage
+        'popular_tags': lambda: list(
+            Tag.objects.annotate(post_count=F('published_post_count'))
+            .filter(published_post_count__gt=0)
+            .order_by('-published_post_count', 'name')[:24]
+        ),
+        # 5. Dynamic Statistics
+        'stats': lambda: published.aggregate(
+            total_posts=Count('id'),
+            total_views=Sum('views'),
+            total_authors=Count('author', distinct=True),
+            posts_this_month=Count(
+                'id',
+                filter=Q(published_at__year=now.year, published_at__month=now.month),
+            ),
+        ),
+        'newsletter_count': lambda: Newsletter.objects.filter(is_active=True).count(),
+        # 6. Trending Posts (last 30 days, by decayed score, see blog.trending)
+        'trending_post_ids': lambda: list(
+            Post.objects.trending(window=timedelta(days=30))
+            .filter(score__gt=0)[:10]
+            .values_list('id', flat=True)
+        ),
+    }
+
+
+def _assemble(results):
+    stats = results.pop('stats')
+    return {
+        **results,
+        'total_posts': stats['total_posts'],
+        'total_views': stats['total_views'] or 0,
+        'total_authors': stats['total_authors'],
+        'posts_this_month': stats['posts_this_month'],
+    }
+
+
+def build_home_snapshot():
+    """Run the homepage queries and return a picklable context dict."""
+    return _assemble({name: query() for name, query in _snapshot_queries().items()})
+
+
+async def abuild_home_snapshot():
+    """Like ``build_home_snapshot``, with the queries running concurrently."""
+    return _assemble(await gather_queries(**_snapshot_queries()))
+
+
+def rebuild_home_snapshot():
+    snapshot = build_home_snapshot()
+    cache.set(SNAPSHOT_KEY, snapshot, snapshot_timeout())
+    # The stale copy outlives the fresh one so readers always have
+    # something to serve while a rebuild is in progress.
+    cache.set(STALE_KEY, snapshot, None)
+    return snapshot
+
+
+def get_home_snapshot():
+    snapshot = cache.get(SNAPSHOT_KEY)
+    note_cache(snapshot is not None)
+    if snapshot is not None:
+        return snapshot
+
+    if cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        try:
+            return rebuild_home_snapshot()
+        finally:
+            cache.delete(LOCK_KEY)
+
+    stale = cache.get(STALE_KEY)
+    if stale is not None:
+        return stale
+
+    # Cold cache and someone else is building: wait for them rather than
+    # piling onto the database, but never longer than WAIT_TIMEOUT.
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        snapshot = cache.get(SNAPSHOT_KEY)
+        if snapshot is not None:
+            return snapshot
+    return build_home_snapshot()
+
+
+async def aget_home_snapshot():
+    """Async ``get_home_snapshot``, with the same locking and stale fallback."""
+    snapshot = await cache.aget(SNAPSHOT_KEY)
+    note_cache(snapshot is not None)
+    if snapshot is not None:
+        return snapshot
+
+    if await cache.aadd(LOCK_KEY, 1, LOCK_TIMEOUT):
+        try:
+            snapshot = await abuild_home_snapshot()
+            await cache.aset(SNAPSHOT_KEY, snapshot, snapshot_timeout())
+            await cache.aset(STALE_KEY, snapshot, None)
+            return snapshot
+        finally:
+            await cache.adelete(LOCK_KEY)
+
+    stale = await cache.aget(STALE_KEY)
+    if stale is not None:
+        return stale
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(WAIT_STEP)
+        snapshot = await cache.aget(SNAPSHOT_KEY)
+        if snapshot is not None:
+            return snapshot
+    return await abuild_home_snapshot()
+
+
+def invalidate_home_snapshot(**kwargs):
+    """Drop the fresh snapshot; the stale copy keeps serving until rebuilt."""
+    cache.delete(SNAPSHOT_KEY)
@@ -0,0 +1,22 @@
+# core/tasks.py
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from . import images
+from .jobs import task
+
+
+@task('core.send_contact_message')
+def send_contact_message(name, email, subject, message):
+    EmailMessage(
+        subject=f'[Contact] {subject or "New message"}',
+        body=f'From: {name} <{email}>\n\n{message}',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[settings.CONTACT_EMAIL],
+        reply_to=[email],
+    ).send()
+
+
+@task('core.generate_image_derivatives', max_attempts=3)
+def generate_image_derivatives(model, pk, field_name):
+    images.generate(model, pk, field_name)
@@ -0,0 +1,69 @@
+# core/templatetags/images.py
+"""
+``srcset`` markup for images with derivatives (see core.images)::
+
+    {% load images %}
+    {% picture post 'featured_image' sizes='(min-width: 768px) 33vw, 100vw' alt=post.title class='w-full h-48 object-cover' %}
+    <img src="..." srcset="{% srcset post 'featured_image' 'webp' %}" sizes="40px">
+
+``picture`` renders a ``<picture>`` with one ``<source>`` per modern
+format and a JPEG ``<img>`` fallback. The ``<img>`` gets the extra
+keyword arguments as attributes (lazy loading unless told otherwise).
+Images whose derivatives haven't been generated yet render as a plain
+``<img>`` of the original file.
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from .. import images
+
+register = template.Library()
+
+
+def _srcset(storage, sizes):
+    return ', '.join(
+        f'{storage.url(name)} {width}w'
+        for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+    )
+
+
+@register.simple_tag
+def srcset(obj, field_name, fmt='jpeg'):
+    """The ``srcset`` value for one format, or '' without derivatives."""
+    manifest = images.get_manifest(obj, field_name) if obj else None
+    if manifest is None:
+        return ''
+    return _srcset(getattr(obj, field_name).storage, manifest['variants'].get(fmt, {}))
+
+
+@register.simple_tag
+def picture(obj, field_name, sizes='100vw', **attrs):
+    file = getattr(obj, field_name, None) if obj else None
+    if not file:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    manifest = images.get_manifest(obj, field_name)
+    if manifest is None:
+        return format_html('<img src="{}"{}>', file.url, _attributes(attrs))
+
+    storage = file.storage
+    variants = manifest['variants']
+    fallback = variants.get('jpeg') or next(iter(variants.values()))
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (images.FORMATS[fmt]['mime'], _srcset(storage, widths), sizes)
+            for fmt, widths in variants.items() if fmt != 'jpeg' and widths
+        ),
+    )
+    largest = max(fallback, key=int)
+    return format_html(
+        '<picture class="contents">{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}></picture>',
+        sources, storage.url(fallback[largest]), _srcset(storage, fallback), sizes,
+        manifest['width'], manifest['height'], _attributes(attrs),
+    )
+
+
+def _attributes(attrs):
+    return format_html_join('', ' {}="{}"', ((name.replace('_', '-'), value) for name, value in attrs.items()))
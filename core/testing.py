@@ -0,0 +1,33 @@
+# core/testing.py
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTestCase(TestCase):
+    """
+    TestCase in which a view running more queries than its ``@query_budget``
+    raises ``core.instrumentation.QueryBudgetExceeded`` and fails the test.
+    """
+
+
+class LocalMediaTestCase(TestCase):
+    """
+    TestCase whose uploads, image derivatives included, go to a throwaway
+    directory through FileSystemStorage instead of Cloudinary.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp(prefix='echotales-media-')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(
+            MEDIA_ROOT=media_root,
+            STORAGES={**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}},
+        )
+        media.enable()
+        cls.addClassCleanup(media.disable)
+        super().setUpClass()
@@ -1,3 +1,309 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from blog.models import Category, Comment, Newsletter, Post, Tag
+from blog.tests import make_posts
+
+from . import checks, images, ratelimit
+from .jobs import claim, enqueue, heartbeat, requeue_stale, run, task
+from .models import Job
+from .testing import LocalMediaTestCase, QueryBudgetTestCase
+
+
+class HomeQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user('writer', 'writer@example.com', 'secret-pass')
+        make_posts(author, Category.objects.create(name='Engineering'), [Tag.objects.create(name='django')])
+
+    def setUp(self):
+        # Start from a cold snapshot
+        cache.clear()
+
+    def test_home(self):
+        response = self.client.get(reverse('core:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Caching Django pages part 11')
+
+    def test_home_from_snapshot(self):
+        # The second request is served from the homepage snapshot
+        self.client.get(reverse('core:home'))
+        response = self.client.get(reverse('core:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Caching Django pages part 11')
+
+    def test_request_log_line_only_warns_when_slow(self):
+        with self.assertLogs('core.instrumentation', 'DEBUG') as logs:
+            self.client.get(reverse('core:home'))
+        self.assertEqual([record.levelname for record in logs.records], ['DEBUG'])
+        with override_settings(INSTRUMENTATION_SLOW_MS=0), self.assertLogs('core.instrumentation', 'WARNING'):
+            self.client_class().get(reverse('core:home'))
+
+
+# Jobs -----------------------------------------------------------------------
+
+calls = []
+
+
+@task('core.tests.record', max_attempts=2)
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError('failed on purpose')
+
+
+@task('core.tests.single', concurrency=1)
+def single():
+    pass
+
+
+@task('core.tests.requeued')
+def requeued():
+    # As if requeue_stale had handed the job to another worker meanwhile
+    Job.objects.filter(name='core.tests.requeued').update(status=Job.QUEUED, locked_by='', locked_at=None, slot=None)
+    heartbeat()
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_records_success(self):
+        job = enqueue('core.tests.record', {'value': 1})
+        claimed = claim('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(claim('worker-2'))
+
+        run(claimed)
+        job.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failure_is_retried_then_recorded(self):
+        job = enqueue('core.tests.record', {'value': 2, 'fail': True})
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run(claim('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('failed on purpose', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run(claim('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, [2, 2])
+
+    def test_concurrency_is_enforced_by_the_claim(self):
+        first = enqueue('core.tests.single')
+        enqueue('core.tests.single')
+        self.assertEqual(claim('worker-1').pk, first.pk)
+        self.assertIsNone(claim('worker-2'))
+        # A second running job in the taken slot is refused by the index
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.exclude(pk=first.pk).update(status=Job.RUNNING, slot=0)
+
+    def test_requeue_stale(self):
+        job = enqueue('core.tests.single')
+        claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.slot, job.locked_by), (Job.QUEUED, None, ''))
+        self.assertEqual(claim('worker-2').pk, job.pk)
+
+    def test_lost_lock_outcome_is_not_recorded(self):
+        job = enqueue('core.tests.requeued')
+        with self.assertLogs('core.jobs', 'WARNING') as logs:
+            run(claim('worker-1'))
+        self.assertIn('lost its lock', logs.output[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIsNone(job.finished_at)
+
+    def test_heartbeat_outside_a_job(self):
+        heartbeat()
+
+
+# Image derivatives ------------------------------------------------------------
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 80, 40, 255)).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='cover.png')
+
+
+@override_settings(
+    IMAGE_DERIVATIVE_WIDTHS={'blog.Post.featured_image': (320, 640, 1280)},
+    IMAGE_DERIVATIVE_FORMATS=('webp', 'jpeg'),
+)
+class ImageDerivativeTests(LocalMediaTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user('writer', 'writer@example.com', 'secret-pass')
+
+    def make_post(self, image):
+        post = Post(title='Cover story', author=self.author, content_html='<p>Body</p>', status='published')
+        post.featured_image.save('cover.png', image, save=False)
+        post.save()
+        return post
+
+    def derivative_jobs(self):
+        return Job.objects.filter(name=images.TASK_NAME, status=Job.QUEUED)
+
+    def test_saving_an_image_queues_derivatives(self):
+        post = self.make_post(png(800, 400))
+        job = self.derivative_jobs().get()
+        self.assertEqual(job.payload, {'model': 'blog.Post', 'pk': post.pk, 'field_name': 'featured_image'})
+        # Saving again doesn't queue a second job
+        post.save()
+        self.assertEqual(self.derivative_jobs().count(), 1)
+
+    def test_generate_records_the_manifest(self):
+        post = self.make_post(png(800, 400))
+        manifest = images.generate('blog.Post', post.pk, 'featured_image')
+        post.refresh_from_db()
+        self.assertEqual(images.get_manifest(post, 'featured_image'), manifest)
+        # Never upscaled: 1280 becomes the original width
+        self.assertEqual(manifest['variants']['jpeg'].keys(), {'320', '640', '800'})
+        self.assertEqual((manifest['width'], manifest['height']), (800, 400))
+        storage = post.featured_image.storage
+        for sizes in manifest['variants'].values():
+            for width, name in sizes.items():
+                with storage.open(name) as file:
+                    self.assertEqual(Image.open(file).width, int(width))
+
+        html = Template("{% load images %}{% picture post 'featured_image' alt='Cover' %}").render(Context({'post': post}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(' 640w', html)
+        self.assertIn('width="800" height="400"', html)
+
+    def test_without_derivatives_the_original_is_used(self):
+        post = self.make_post(png(400, 200))
+        html = Template("{% load images %}{% picture post 'featured_image' %}").render(Context({'post': post}))
+        self.assertEqual(html, f'<img src="{post.featured_image.url}" loading="lazy" decoding="async">')
+
+    def test_replaced_image_drops_stale_derivatives(self):
+        post = self.make_post(png(800, 400))
+        old = images.generate('blog.Post', post.pk, 'featured_image')
+        # As the admin would, edit the post with its manifest loaded
+        post.refresh_from_db()
+        post.featured_image.save('other.png', png(600, 300))
+        # The old manifest no longer matches the image
+        self.assertIsNone(images.get_manifest(post, 'featured_image'))
+
+        new = images.generate('blog.Post', post.pk, 'featured_image')
+        storage = post.featured_image.storage
+        self.assertTrue(all(storage.exists(name) for name in new['variants']['jpeg'].values()))
+        self.assertFalse(any(storage.exists(name) for name in old['variants']['jpeg'].values()))
+
+    def test_removed_image_clears_the_manifest(self):
+        post = self.make_post(png(800, 400))
+        images.generate('blog.Post', post.pk, 'featured_image')
+        post.refresh_from_db()
+        post.featured_image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.featured_image_variants, {})
+
+    def test_job_runs_generation(self):
+        post = self.make_post(png(800, 400))
+        run(claim('worker-1', names=[images.TASK_NAME]))
+        post.refresh_from_db()
+        self.assertIsNotNone(images.get_manifest(post, 'featured_image'))
+
+
+# Rate limits ------------------------------------------------------------------
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMIT_BACKEND='core.ratelimit.MemoryBackend')
+class RateLimitTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create_user('writer', 'writer@example.com', 'secret-pass')
+        cls.reader = get_user_model().objects.create_user('reader', 'reader@example.com', 'secret-pass')
+        cls.post = make_posts(cls.author, None, [], count=1)[0]
+
+    def setUp(self):
+        ratelimit.reset()
+
+    def subscribe(self, email, **extra):
+        return self.client.post(reverse('blog:newsletter_subscribe'), {'email': email}, **extra)
+
+    def comment(self):
+        return self.client.post(reverse('blog:add_comment', args=[self.post.slug]), {'content': 'Nice post'})
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('10/m'), (10, 60))
+        self.assertEqual(ratelimit.parse_rate('5/30'), (5, 30))
+        with self.assertRaises(ImproperlyConfigured):
+            ratelimit.parse_rate('10 per minute')
+
+    def test_sliding_window(self):
+        # 3/m: the previous window still counts by how much of it overlaps
+        for _ in range(3):
+            self.assertEqual(ratelimit.hit('test', 'ip', 'a', '3/m', now=30), 0)
+        self.assertEqual(ratelimit.hit('test', 'ip', 'a', '3/m', now=59), 1)
+        # 15s into the next window, 3 * 45/60 of the old hits remain
+        self.assertGreater(ratelimit.hit('test', 'ip', 'a', '3/m', now=75), 0)
+        self.assertEqual(ratelimit.hit('test', 'ip', 'b', '3/m', now=75), 0)
+
+    @override_settings(RATELIMITS={'newsletter': {'ip': '2/m'}})
+    def test_limited_request_gets_429_before_the_view(self):
+        self.assertEqual(self.subscribe('one@example.com').status_code, 200)
+        self.assertEqual(self.subscribe('two@example.com').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.subscribe('three@example.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertFalse(Newsletter.objects.filter(email='three@example.com').exists())
+        # Other clients still have room
+        self.assertEqual(self.subscribe('four@example.com', REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+    @override_settings(RATELIMITS={'newsletter': {'ip': '1/m'}}, RATELIMIT_PROXY_COUNT=1)
+    def test_client_ip_behind_a_proxy(self):
+        # The proxy appends the address it saw; anything before it is the client's claim
+        self.assertEqual(self.subscribe('one@example.com', HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1').status_code, 200)
+        self.assertEqual(self.subscribe('two@example.com', HTTP_X_FORWARDED_FOR='2.2.2.2, 10.0.0.1').status_code, 429)
+        self.assertEqual(self.subscribe('three@example.com', HTTP_X_FORWARDED_FOR='10.0.0.2').status_code, 200)
+
+    @override_settings(RATELIMITS={'comment': {'user': '1/m', 'ip': None}})
+    def test_limits_per_user(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.comment().status_code, 200)
+        self.assertEqual(self.comment().status_code, 429)
+        self.client.force_login(self.author)
+        self.assertEqual(self.comment().status_code, 200)
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 2)
+
+    @override_settings(RATELIMIT_ENABLED=False, RATELIMITS={'newsletter': {'ip': '1/m'}})
+    def test_disabled(self):
+        self.assertEqual(self.subscribe('one@example.com').status_code, 200)
+        self.assertEqual(self.subscribe('two@example.com').status_code, 200)
+
+    def test_cache_backend_needs_a_shared_cache(self):
+        caches = {**settings.CACHES, 'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=caches, RATELIMIT_CACHE='local'):
+            # A per-process cache is fine for MemoryBackend, not for CacheBackend
+            self.assertEqual(checks.check_ratelimit_cache(None), [])
+            with override_settings(RATELIMIT_BACKEND='core.ratelimit.CacheBackend'):
+                self.assertEqual([error.id for error in checks.check_ratelimit_cache(None)], ['core.E003'])
@@ -1,12 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'core'
 
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', (async_views if settings.ASYNC_VIEWS else views).home, name='home'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
+    path('csrf/', views.csrf_token, name='csrf_token'),
     path("privacy-policy/", views.PrivacyPolicyView.as_view(), name="privacy_policy"),
     path("cookie-policy/", views.CookiePolicyView.as_view(), name="cookie_policy"),
     path("faq/", views.FAQView.as_view(), name="faq"),
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_customuser_bio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 20:01
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_published_post_count(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Post = apps.get_model('blog', 'Post')
+
+    counted = (
+        Post.objects.filter(status='published', author_id=OuterRef('pk'))
+        .order_by()
+        .values('author_id')
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    CustomUser.objects.update(
+        published_post_count=Coalesce(Subquery(counted, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_image_variants'),
+        ('blog', '0012_reading_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_published_post_count, migrations.RunPython.noop),
+    ]
@@ -4,11 +4,16 @@ from django.db import models
 class CustomUser(AbstractUser):
     bio = models.TextField(max_length=2500, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Resized copies of avatar, see core.images
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     website = models.URLField(blank=True)
     twitter = models.CharField(max_length=100, blank=True)
     github = models.CharField(max_length=100, blank=True)
     linkedin = models.CharField(max_length=100, blank=True)
     location = models.CharField(max_length=100, blank=True)
+
+    # Maintained by blog.signals; repair with `manage.py recount`
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return self.username